@@ -1,8 +1,13 @@
+from sqlalchemy import exc
 from sqlalchemy.engine import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
 from urllib.parse import quote as urlquote
 from sqlalchemy.orm import sessionmaker
 from dotenv import dotenv_values
+import threading
+import time
 
 config = dotenv_values(".env")
 
@@ -12,11 +17,102 @@ dbuser = config.get("DBUSER")
 dbpass = config.get("DBPASS")
 dbname = config.get("DBNAME")
 
+# Connection pool settings. The defaults leave headroom for the 40 request
+# threads instead of queueing them on SQLAlchemy's 5 connection default.
+# DB_POOL_SIZE / DB_MAX_OVERFLOW are the budget for the whole worker; the
+# async engine takes DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW of it and the
+# sync engine the rest, so one worker never holds more than the budget.
+DB_POOL_SIZE = int(config.get("DB_POOL_SIZE") or 20)
+DB_MAX_OVERFLOW = int(config.get("DB_MAX_OVERFLOW") or 20)
+DB_ASYNC_POOL_SIZE = max(1, min(int(config.get("DB_ASYNC_POOL_SIZE") or 5), DB_POOL_SIZE - 1))
+DB_ASYNC_MAX_OVERFLOW = min(int(config.get("DB_ASYNC_MAX_OVERFLOW") or 5), DB_MAX_OVERFLOW)
+DB_POOL_TIMEOUT = float(config.get("DB_POOL_TIMEOUT") or 30)
+DB_POOL_RECYCLE = int(config.get("DB_POOL_RECYCLE") or 1800)
+DB_POOL_PRE_PING = (config.get("DB_POOL_PRE_PING") or "true").lower() in ("1", "true", "yes")
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait for a free connection, and
+    separately how long opening new connections takes, so a slow database
+    handshake is not mistaken for pool exhaustion.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = {"checkouts": 0, "total_wait": 0.0, "max_wait": 0.0, "timeouts": 0,
+                           "connects": 0, "total_connect": 0.0, "max_connect": 0.0}
+        self._stats_lock = threading.Lock()
+        self._timing = threading.local()
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._timing.connect = getattr(self._timing, "connect", 0.0) + elapsed
+            with self._stats_lock:
+                self.wait_stats["connects"] += 1
+                self.wait_stats["total_connect"] += elapsed
+                self.wait_stats["max_connect"] = max(self.wait_stats["max_connect"], elapsed)
+
+    def _do_get(self):
+        timing = self._timing
+        if getattr(timing, "active", False):
+            # QueuePool retries by calling _do_get again; time the outer call only.
+            return super()._do_get()
+        timing.active, timing.connect = True, 0.0
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.wait_stats["timeouts"] += 1
+            raise
+        finally:
+            timing.active = False
+            waited = time.perf_counter() - start - timing.connect
+            with self._stats_lock:
+                self.wait_stats["checkouts"] += 1
+                self.wait_stats["total_wait"] += waited
+                self.wait_stats["max_wait"] = max(self.wait_stats["max_wait"], waited)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_stats = self.wait_stats
+        pool._stats_lock = self._stats_lock
+        return pool
+
+
 dburl = f"postgresql+psycopg2://{dbuser}:%s@{dbhost}:5432/{dbname}"
-engine = create_engine(dburl % urlquote(f"{dbpass}"))
+engine = create_engine(
+    dburl % urlquote(f"{dbpass}"),
+    poolclass=TimedQueuePool,
+    pool_size=max(1, DB_POOL_SIZE - DB_ASYNC_POOL_SIZE),
+    max_overflow=DB_MAX_OVERFLOW - DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+# Async engine for read-heavy routes, so they do not hold a threadpool
+# worker while waiting on Postgres. Sized from its share of the pool budget.
+async_dburl = f"postgresql+asyncpg://{dbuser}:%s@{dbhost}:5432/{dbname}"
+async_engine = create_async_engine(
+    async_dburl % urlquote(f"{dbpass}"),
+    pool_size=DB_ASYNC_POOL_SIZE,
+    max_overflow=DB_ASYNC_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False,
+                                       expire_on_commit=False)
+
 
 Base = declarative_base()
 
@@ -27,3 +123,33 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_metrics():
+    pool = engine.pool
+    with pool._stats_lock:
+        stats = dict(pool.wait_stats)
+    checkouts = stats["checkouts"]
+    connects = stats["connects"]
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "checkouts": checkouts,
+        "checkout_timeouts": stats["timeouts"],
+        "avg_checkout_wait_ms": round(stats["total_wait"] / checkouts * 1000, 3) if checkouts else 0.0,
+        "max_checkout_wait_ms": round(stats["max_wait"] * 1000, 3),
+        "connects": connects,
+        "avg_connect_ms": round(stats["total_connect"] / connects * 1000, 3) if connects else 0.0,
+        "max_connect_ms": round(stats["max_connect"] * 1000, 3),
+        "async_pool_size": async_engine.pool.size(),
+        "async_max_overflow": DB_ASYNC_MAX_OVERFLOW,
+        "async_checked_out": async_engine.pool.checkedout(),
+    }
@@ -0,0 +1,221 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable
+
+from dotenv import dotenv_values
+
+"""
+
+    Stale-while-revalidate cache for Business Central backed GET endpoints.
+
+    A value younger than its TTL is served as is. Once older, it is still
+    served for up to BC_CACHE_STALE_TTL more seconds while one background
+    thread reloads it. A miss (or a value past both windows) is loaded on
+    the request path, and concurrent misses for the same key wait on that
+    single load instead of each calling BC.
+
+    Values live in process memory, or in Redis (BC_CACHE_BACKEND=redis) so
+    every worker shares them; a short Redis lock keeps workers from
+    refreshing the same key at once.
+
+    A loader that could not get all of its data raises UncachedResult: the
+    callers of that load still get its value, but nothing is stored, so a
+    failed refresh keeps serving the previous value.
+
+"""
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = dotenv_values(".env")
+
+BC_CACHE_BACKEND = config.get("BC_CACHE_BACKEND") or "memory"
+BC_CACHE_TTL = float(config.get("BC_CACHE_TTL") or 60)
+BC_CACHE_STALE_TTL = float(config.get("BC_CACHE_STALE_TTL") or 600)
+
+
+class UncachedResult(Exception):
+    """Raised by a loader with a usable value that must not be cached."""
+
+    def __init__(self, value, reason: str):
+        super().__init__(reason)
+        self.value = value
+
+
+class MemoryCacheStore():
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, fetched_at: float, expire: float):
+        with self._lock:
+            self._data[key] = (value, fetched_at)
+
+    def acquire_refresh(self, key, ttl: float):
+        # In-process refreshes are already single-flight.
+        return True
+
+    def release_refresh(self, key):
+        pass
+
+
+class RedisCacheStore():
+
+    def __init__(self, url: str, prefix: str = "bccache:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["value"], entry["fetched_at"]
+
+    def set(self, key, value, fetched_at: float, expire: float):
+        self.client.set(self.prefix + key,
+                        json.dumps({"value": value, "fetched_at": fetched_at}),
+                        ex=max(1, int(expire)))
+
+    def acquire_refresh(self, key, ttl: float):
+        return bool(self.client.set(self.prefix + key + ":refresh", "1", nx=True, ex=max(1, int(ttl))))
+
+    def release_refresh(self, key):
+        self.client.delete(self.prefix + key + ":refresh")
+
+
+class StaleWhileRevalidateCache():
+
+    def __init__(self, store, ttl: float, stale_ttl: float):
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._ttls = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"fresh": 0, "stale": 0, "miss": 0, "coalesced": 0, "uncached": 0,
+                       "refreshes": 0, "refresh_errors": 0}
+
+    def set_ttl(self, key, ttl: float):
+        self._ttls[key] = ttl
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _claim(self, key):
+        """The in-flight load for key and whether this caller registered it."""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _release(self, key, future: Future, value):
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _run_load(self, key, future: Future, loader: Callable):
+        try:
+            value = loader()
+            self.store.set(key, value, time.time(), self._ttls.get(key, self.ttl) + self.stale_ttl)
+            future.set_result(value)
+            return value
+        except UncachedResult as e:
+            future.set_result(e.value)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load(self, key, loader: Callable):
+        """
+        Run loader once for key; concurrent callers for the same key get the
+        same result (or exception).
+        """
+        future, owner = self._claim(key)
+        if not owner:
+            self._count("coalesced")
+            return future.result()
+        try:
+            return self._run_load(key, future, loader)
+        except UncachedResult as e:
+            self._count("uncached")
+            logger.warning("Not caching %s: %s", key, e)
+            return e.value
+
+    def _refresh(self, key, future: Future, loader: Callable):
+        try:
+            self._run_load(key, future, loader)
+            self._count("refreshes")
+        except UncachedResult as e:
+            self._count("refresh_errors")
+            logger.warning("Background refresh of %s incomplete (%s), serving stale data", key, e)
+        except Exception:
+            self._count("refresh_errors")
+            logger.exception("Background refresh of %s failed, serving stale data", key)
+        finally:
+            self.store.release_refresh(key)
+
+    def get_or_load(self, key: str, loader: Callable):
+        ttl = self._ttls.get(key, self.ttl)
+        entry = self.store.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < ttl:
+                self._count("fresh")
+                return value
+            if age < ttl + self.stale_ttl:
+                self._count("stale")
+                # Registered before the thread starts, so concurrent stale
+                # hits see the refresh in flight and do not start another.
+                future, owner = self._claim(key)
+                if owner:
+                    if self.store.acquire_refresh(key, ttl):
+                        threading.Thread(target=self._refresh, args=(key, future, loader),
+                                         name=f"bc-cache-{key}", daemon=True).start()
+                    else:
+                        # Another worker is refreshing it.
+                        self._release(key, future, value)
+                return value
+
+        self._count("miss")
+        return self._load(key, loader)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({"backend": type(self.store).__name__, "ttl": self.ttl,
+                      "stale_ttl": self.stale_ttl, "ttl_overrides": dict(self._ttls)})
+        return stats
+
+
+if BC_CACHE_BACKEND == "redis":
+    bc_cache_store = RedisCacheStore(config.get("REDIS_URL") or "redis://localhost:6379/0")
+else:
+    bc_cache_store = MemoryCacheStore()
+
+bc_cache = StaleWhileRevalidateCache(bc_cache_store, BC_CACHE_TTL, BC_CACHE_STALE_TTL)
+
+# Per integration TTL, e.g. BC_CACHE_TTL_VEHICLES_INSPECTION=30
+for _key in ("line_clearance", "materials_receiving", "vehicles_inspection"):
+    _ttl = config.get(f"BC_CACHE_TTL_{_key.upper()}")
+    if _ttl:
+        bc_cache.set_ttl(_key, float(_ttl))
@@ -0,0 +1,361 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import quote, urljoin
+
+import pandas as pd
+import requests
+from dotenv import dotenv_values
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+"""
+
+    Process-wide Business Central OData client.
+
+    One keep-alive requests.Session is shared by every integration, so TLS
+    and NTLM/basic handshakes happen once per pooled connection rather than
+    once per request. Connections per host are capped, every call has a
+    connect/read timeout and idempotent GETs are retried with backoff on
+    connection errors, 429 and 5xx.
+
+    Collections are read page by page: the client asks for BC_PAGE_SIZE
+    records per page (Prefer: odata.maxpagesize) and follows @odata.nextLink
+    until the server stops returning one.
+
+    An ODataQuery declares which columns and rows an integration needs, so
+    $select/$filter/$orderby are applied by Business Central rather than in
+    pandas after a full download.
+
+    fetch_dataframes() runs an integration's independent collection fetches
+    side by side on a bounded thread pool, under one deadline. The deadline
+    travels down to every page request, so a fetch that overruns it gives
+    its worker and pooled connection back instead of running on.
+
+"""
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = dotenv_values(".env")
+
+BC_USERNAME = config.get("BC_USERNAME")
+BC_PASSWORD = config.get("BC_PASSWORD")
+BC_AUTH = (config.get("BC_AUTH") or "basic").lower()
+BC_VERIFY_SSL = (config.get("BC_VERIFY_SSL") or "true").lower() in ("1", "true", "yes")
+
+# Distinct hosts kept in the pool, and open connections allowed per host.
+BC_POOL_HOSTS = int(config.get("BC_POOL_HOSTS") or 4)
+BC_POOL_MAXSIZE = int(config.get("BC_POOL_MAXSIZE") or 8)
+BC_CONNECT_TIMEOUT = float(config.get("BC_CONNECT_TIMEOUT") or 5)
+BC_READ_TIMEOUT = float(config.get("BC_READ_TIMEOUT") or 60)
+BC_RETRIES = int(config.get("BC_RETRIES") or 3)
+BC_BACKOFF = float(config.get("BC_BACKOFF") or 0.5)
+BC_PAGE_SIZE = int(config.get("BC_PAGE_SIZE") or 5000)
+
+# Threads shared by all concurrent collection fetches, and the default time
+# an integration waits for all of its collections.
+BC_FETCH_WORKERS = int(config.get("BC_FETCH_WORKERS") or 8)
+BC_FETCH_DEADLINE = float(config.get("BC_FETCH_DEADLINE") or 120)
+
+
+# Characters left unescaped in OData query option values.
+ODATA_SAFE_CHARS = "',()/:"
+
+# Deadline (time.monotonic()) of the fetch running on the current thread.
+_fetch_deadline = threading.local()
+
+
+class DeadlineRetry(Retry):
+    """Retry that stops retrying once the calling fetch's deadline has passed."""
+
+    def is_exhausted(self) -> bool:
+        deadline_at = getattr(_fetch_deadline, "at", None)
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            return True
+        return super().is_exhausted()
+
+
+class ODataQuery():
+    """$select / $filter / $orderby options for one OData collection."""
+
+    def __init__(self, select: Iterable[str] = (), filter: str = None, orderby: str = None):
+        self.select = tuple(select)
+        self.filter = filter
+        self.orderby = orderby
+
+    def options(self):
+        options = []
+        if self.select:
+            options.append(("$select", ",".join(self.select)))
+        if self.filter:
+            options.append(("$filter", self.filter))
+        if self.orderby:
+            options.append(("$orderby", self.orderby))
+        return options
+
+    def url(self, base_url: str):
+        """base_url with the query options appended, spaces encoded as %20."""
+        options = self.options()
+        if not options:
+            return base_url
+        query = "&".join(f"{k}={quote(v, safe=ODATA_SAFE_CHARS)}" for k, v in options)
+        return f"{base_url}{'&' if '?' in base_url else '?'}{query}"
+
+
+class BCClient():
+
+    def __init__(self, username: str, password: str, auth_type: str = "basic",
+                 verify_ssl: bool = True, pool_hosts: int = 4, pool_maxsize: int = 8,
+                 timeout=(5, 60), retries: int = 3, backoff: float = 0.5,
+                 page_size: int = 5000, fetch_workers: int = 8, fetch_deadline: float = 120):
+        self.username = username
+        self.password = password
+        self.auth_type = auth_type
+        self.verify_ssl = verify_ssl
+        self.pool_hosts = pool_hosts
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.page_size = page_size
+        self.fetch_workers = fetch_workers
+        self.fetch_deadline = fetch_deadline
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _auth(self):
+        if self.auth_type == "ntlm":
+            from requests_ntlm import HttpNtlmAuth
+
+            return HttpNtlmAuth(self.username, self.password)
+        return HTTPBasicAuth(self.username, self.password)
+
+    def _build_session(self):
+        retry = DeadlineRetry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # pool_block keeps concurrent callers within pool_maxsize connections
+        # per host instead of opening throwaway extra ones.
+        adapter = HTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_maxsize,
+                              max_retries=retry, pool_block=True)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.auth = self._auth()
+        session.verify = self.verify_ssl
+        session.headers.update({"Accept": "application/json"})
+        logger.info(f"BC client for {self.username} ({self.auth_type}), "
+                    f"SSL verification {'enabled' if self.verify_ssl else 'DISABLED (INSECURE)'}")
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.fetch_workers,
+                                                        thread_name_prefix="bc-fetch")
+        return self._executor
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(url, **kwargs)
+
+    def _remaining(self, deadline_at: float, url: str):
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout(f"Deadline passed while fetching {url}")
+        return remaining
+
+    def _get_json(self, url: str, deadline_at: float = None, **kwargs):
+        """
+        GET url and decode its JSON body. With deadline_at (a time.monotonic()
+        value) the connect/read timeouts are capped at the time left, retries
+        stop at it and the body is read in chunks, so the whole request ends
+        by deadline_at.
+        """
+        if deadline_at is None:
+            response = self.get(url, **kwargs)
+            response.raise_for_status()
+            return response.json()
+
+        remaining = self._remaining(deadline_at, url)
+        connect, read = self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+        timeout = (min(connect, remaining), min(read, remaining))
+        _fetch_deadline.at = deadline_at
+        try:
+            with self.get(url, timeout=timeout, stream=True, **kwargs) as response:
+                response.raise_for_status()
+                chunks = []
+                for chunk in response.iter_content(chunk_size=65536):
+                    chunks.append(chunk)
+                    self._remaining(deadline_at, url)
+        finally:
+            _fetch_deadline.at = None
+        return json.loads(b"".join(chunks))
+
+    def iter_pages(self, url: str, page_size: int = None, top: int = None,
+                   skip: int = None, params: Dict = None,
+                   deadline_at: float = None) -> Iterator[List[Dict]]:
+        """
+        Yield the records of an OData collection one server page at a time,
+        following @odata.nextLink. top/skip become $top/$skip on the first
+        request; page_size (default BC_PAGE_SIZE, 0 to leave it to the
+        server) is sent as Prefer: odata.maxpagesize. Past deadline_at (a
+        time.monotonic() value) it raises requests.exceptions.Timeout.
+        """
+        params = dict(params or {})
+        if top is not None:
+            params["$top"] = top
+        if skip is not None:
+            params["$skip"] = skip
+
+        page_size = self.page_size if page_size is None else page_size
+        headers = {"Prefer": f"odata.maxpagesize={page_size}"} if page_size else {}
+
+        seen = set()
+        next_url = url
+        while next_url:
+            data = self._get_json(next_url, deadline_at, params=params or None, headers=headers)
+            yield data.get("value", [])
+
+            next_link = data.get("@odata.nextLink")
+            if not next_link:
+                break
+            # nextLink carries the original query plus a skip token.
+            next_url = urljoin(next_url, next_link)
+            params = None
+            if next_url in seen:
+                logger.warning(f"Stopping at repeated @odata.nextLink {next_url}")
+                break
+            seen.add(next_url)
+
+    def iter_dataframes(self, url: str, date_columns: Iterable[str] = (),
+                        **page_args) -> Iterator[pd.DataFrame]:
+        """Like iter_pages but yields each non-empty page as a DataFrame."""
+        for records in self.iter_pages(url, **page_args):
+            if not records:
+                continue
+            df = pd.DataFrame(records)
+            for col in date_columns:
+                if col in df.columns:
+                    df[col] = pd.to_datetime(df[col], errors="coerce")
+            yield df
+
+    def fetch_dataframe(self, url: str, name: str = None, date_columns: Iterable[str] = (),
+                        query: ODataQuery = None, **page_args) -> Optional[pd.DataFrame]:
+        """
+        Fetch every page of an OData collection into one DataFrame, narrowed
+        by query when one is given.
+
+        Each page is converted as it arrives, so only one page of raw JSON is
+        held at a time. Returns an empty DataFrame when the collection has no
+        records, or None if a request or response failed.
+        """
+        name = name or url
+        if query is not None:
+            url = query.url(url)
+        logger.info(f"Attempting to fetch data from: {url}")
+
+        try:
+            frames = list(self.iter_dataframes(url, date_columns, **page_args))
+            if not frames:
+                logger.info(f"No records found in the 'value' array for {name}.")
+                return pd.DataFrame()
+
+            df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            logger.info(f"Successfully fetched {len(df)} records in {len(frames)} pages from {name}.")
+            return df
+
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"HTTP Error fetching data from {name}: {e}")
+            logger.error(f"Status Code: {e.response.status_code}")
+            if e.response.text and len(e.response.text) < 1000:
+                logger.error(f"Response Body: {e.response.text}")
+            else:
+                logger.error(f"Response Body (truncated): {e.response.text[:500]}...")
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Connection Error fetching data from {name}: {e}")
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Timed out fetching data from {name}: {e}")
+        except ValueError as e:
+            logger.error(f"Error parsing JSON response from {name}: {e}")
+        except Exception as e:
+            logger.error(f"Unexpected error fetching data from {name}: {e}")
+
+        return None
+
+    def fetch_dataframes(self, fetches: Dict[str, Dict],
+                         deadline: float = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        Run several fetch_dataframe() calls concurrently.
+
+        fetches maps a name to fetch_dataframe keyword arguments (url,
+        date_columns, query, ...). Waits at most deadline seconds (default
+        BC_FETCH_DEADLINE) for all of them; a fetch that failed or did not
+        finish in time comes back as None.
+        """
+        deadline = self.fetch_deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline
+        futures = {
+            name: self.executor.submit(self.fetch_dataframe, name=name, deadline_at=deadline_at, **kwargs)
+            for name, kwargs in fetches.items()
+        }
+        wait(futures.values(), timeout=deadline)
+
+        results = {}
+        for name, future in futures.items():
+            if future.done():
+                results[name] = future.result()
+            else:
+                # A running fetch stops at its next page or chunk once
+                # deadline_at has passed; this only drops queued ones.
+                future.cancel()
+                logger.error(f"Fetching {name} did not finish within {deadline}s deadline.")
+                results[name] = None
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+bc_client = BCClient(
+    BC_USERNAME,
+    BC_PASSWORD,
+    auth_type=BC_AUTH,
+    verify_ssl=BC_VERIFY_SSL,
+    pool_hosts=BC_POOL_HOSTS,
+    pool_maxsize=BC_POOL_MAXSIZE,
+    timeout=(BC_CONNECT_TIMEOUT, BC_READ_TIMEOUT),
+    retries=BC_RETRIES,
+    backoff=BC_BACKOFF,
+    page_size=BC_PAGE_SIZE,
+    fetch_workers=BC_FETCH_WORKERS,
+    fetch_deadline=BC_FETCH_DEADLINE,
+)
@@ -0,0 +1,437 @@
+import asyncio
+import datetime
+import logging
+import sys
+import time
+import zlib
+from typing import Dict, Iterable, Optional
+
+import pandas as pd
+from dotenv import dotenv_values
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Date, DateTime, Numeric, func, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from api import models
+from api.database import SessionLocal, engine
+from api.libs.bc_client import bc_client, ODataQuery
+from api.libs.cache import TTLCache
+
+"""
+
+    Delta sync of Business Central collections into local mirror tables.
+
+    Each SyncEntity is copied into its mirror model (see models.BC*). A sync
+    only asks BC for records past the entity's high-water mark, Entry_No for
+    ledger style collections and SystemModifiedAt for the rest, and upserts
+    them on the entity key. Every BC_SYNC_FULL_SECONDS a full reconcile
+    re-reads the whole collection and drops mirrored rows BC no longer has.
+
+    Integrations read the mirror with SQL (mirror_dataframes) while every
+    entity they need synced within BC_MIRROR_MAX_AGE seconds, and fall back
+    to BC otherwise.
+
+    Sync once, e.g. from cron:
+
+        python -m api.libs.bc_sync [--full]
+
+    or set BC_SYNC_SECONDS to have the API sync in the background.
+
+"""
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = dotenv_values(".env")
+
+BC_BASE_URL = config.get("BC_BASE_URL")
+VEHICLES_INSPECTION_URL = config.get("VEHICLES_INSPECTION_URL")
+NEXTSERVICE_URL = config.get("NEXTSERVICE_URL")
+
+BC_SYNC_SECONDS = int(config.get("BC_SYNC_SECONDS") or 0)
+BC_SYNC_FULL_SECONDS = int(config.get("BC_SYNC_FULL_SECONDS") or 86400)
+BC_MIRROR_MAX_AGE = int(config.get("BC_MIRROR_MAX_AGE") or 900)
+# How long a worker may go without finishing a page before another worker
+# may take over its entity.
+BC_SYNC_LEASE_SECONDS = int(config.get("BC_SYNC_LEASE_SECONDS") or 600)
+
+# Sync state as seen by readers, re-read at most this often.
+state_cache = TTLCache(maxsize=16, ttl=15)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _aware(value: datetime.datetime):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def _parse_date(value):
+    return datetime.date.fromisoformat(value[:10]) if isinstance(value, str) and value else None
+
+
+def _parse_datetime(value):
+    if not isinstance(value, str) or not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _parser(column_type):
+    """OData sends dates as ISO strings; turn them into date/datetime values."""
+    if isinstance(column_type, DateTime):
+        return _parse_datetime
+    if isinstance(column_type, Date):
+        return _parse_date
+    return lambda value: value
+
+
+class SyncEntity():
+
+    def __init__(self, name: str, url: str, model, key: str, hwm_column: str, filter: str = None):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.table = model.__table__
+        self.key = key
+        self.hwm_column = hwm_column
+        self.filter = filter
+        self.columns = [c.name for c in self.table.columns if c.name != "synced_at"]
+        self._parsers = {c.name: _parser(c.type) for c in self.table.columns if c.name in self.columns}
+
+    @property
+    def table_name(self):
+        return f"{self.table.schema}.{self.table.name}"
+
+    def format_hwm(self, value):
+        if isinstance(value, datetime.datetime):
+            return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        return str(value)
+
+    def query(self, high_water_mark: str = None):
+        filters = [f"({self.filter})"] if self.filter else []
+        if high_water_mark:
+            # Timestamps can tie with the last synced record, so re-read the
+            # boundary; the upsert makes that harmless.
+            op = "gt" if self.hwm_column == "Entry_No" else "ge"
+            filters.append(f"{self.hwm_column} {op} {high_water_mark}")
+        return ODataQuery(select=self.columns, filter=" and ".join(filters) or None,
+                          orderby=f"{self.hwm_column} asc")
+
+    def rows(self, records: Iterable[Dict], synced_at: datetime.datetime):
+        return [{**{c: parse(record.get(c)) for c, parse in self._parsers.items()}, "synced_at": synced_at}
+                for record in records]
+
+
+def _sync_entities():
+    entities = []
+    if BC_BASE_URL:
+        entities += [
+            SyncEntity("OshoProductionOrder", f"{BC_BASE_URL}/OshoProductionOrder",
+                       models.BCProductionOrder, key="SystemId", hwm_column="SystemModifiedAt"),
+            SyncEntity("ProductionBatchLog", f"{BC_BASE_URL}/ProductionBatchLog",
+                       models.BCProductionBatchLog, key="Entry_No", hwm_column="Entry_No"),
+            SyncEntity("PostedPurchaseReceipts", f"{BC_BASE_URL}/PostedPurchaseReceipts",
+                       models.BCPostedPurchaseReceipt, key="SystemId", hwm_column="SystemModifiedAt",
+                       filter="Location_Code eq 'OSHO PROD' or Location_Code eq 'OSHO'"),
+            SyncEntity("PostedPurchaseReceiptLines", f"{BC_BASE_URL}/PostedPurchaseReceiptLines",
+                       models.BCPostedPurchaseReceiptLine, key="SystemId", hwm_column="SystemModifiedAt",
+                       filter="(Location_Code eq 'OSHO PROD' or Location_Code eq 'OSHO') and Type eq 'Item'"),
+        ]
+    if VEHICLES_INSPECTION_URL:
+        entities.append(SyncEntity("MaintenanceEntries", VEHICLES_INSPECTION_URL,
+                                   models.BCMaintenanceEntry, key="Entry_No", hwm_column="Entry_No"))
+    if NEXTSERVICE_URL:
+        entities.append(SyncEntity("NextService", NEXTSERVICE_URL, models.BCNextService,
+                                   key="SystemId", hwm_column="SystemModifiedAt"))
+    return {entity.name: entity for entity in entities}
+
+
+SYNC_ENTITIES = _sync_entities()
+
+
+def _upsert(db: Session, entity: SyncEntity, rows):
+    stmt = pg_insert(entity.table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[entity.key],
+        set_={c: stmt.excluded[c] for c in [*entity.columns, "synced_at"] if c != entity.key},
+    )
+    db.execute(stmt)
+
+
+def _get_state(db: Session, entity: SyncEntity):
+    state = db.query(models.BCSyncState).filter(models.BCSyncState.entity == entity.name).first()
+    if state is None:
+        state = models.BCSyncState(entity=entity.name, table_name=entity.table_name, row_count=0)
+        db.add(state)
+    return state
+
+
+def _claim(db: Session, entity: SyncEntity, now: datetime.datetime):
+    """Take the entity's sync lease unless another worker holds it."""
+    table = models.BCSyncState.__table__
+    db.execute(pg_insert(table).values(entity=entity.name, table_name=entity.table_name, row_count=0)
+               .on_conflict_do_nothing(index_elements=[table.c.entity]))
+    claimed = db.execute(
+        update(table)
+        .where(table.c.entity == entity.name)
+        .where(or_(table.c.lease_until.is_(None), table.c.lease_until < now))
+        .values(lease_until=now + datetime.timedelta(seconds=BC_SYNC_LEASE_SECONDS))
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def _set_lease(db: Session, entity: SyncEntity, lease_until: Optional[datetime.datetime]):
+    table = models.BCSyncState.__table__
+    db.execute(update(table).where(table.c.entity == entity.name).values(lease_until=lease_until))
+
+
+def _release(db: Session, entity: SyncEntity):
+    try:
+        db.rollback()
+        _set_lease(db, entity, None)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Failed to release the sync lease for %s, it expires on its own", entity.name)
+
+
+def sync_entity(db: Session, entity: SyncEntity, full: bool = False):
+    """
+    Bring entity's mirror up to date with BC. Returns a summary dict, or
+    None when another worker is syncing it.
+
+    Each BC page is upserted and committed on its own, so no transaction
+    or connection is held while BC is answering. A lease row in the sync
+    state keeps other workers off the entity meanwhile.
+    """
+    started = _now()
+    if not _claim(db, entity, started):
+        return None
+    try:
+        return _sync_claimed(db, entity, full, started)
+    finally:
+        _release(db, entity)
+
+
+def _sync_claimed(db: Session, entity: SyncEntity, full: bool, started: datetime.datetime):
+    state = _get_state(db, entity)
+    clock = time.perf_counter()
+    full = (
+        full
+        or not state.high_water_mark
+        or state.last_full_sync_at is None
+        or (started - _aware(state.last_full_sync_at)).total_seconds() >= BC_SYNC_FULL_SECONDS
+    )
+    url = entity.query(None if full else state.high_water_mark).url(entity.url)
+    db.commit()
+
+    fetched = 0
+    for records in bc_client.iter_pages(url):
+        if records:
+            _upsert(db, entity, entity.rows(records, started))
+            fetched += len(records)
+        _set_lease(db, entity, _now() + datetime.timedelta(seconds=BC_SYNC_LEASE_SECONDS))
+        db.commit()
+
+    deleted = 0
+    if full:
+        # Everything BC still has was stamped by this run.
+        deleted = db.execute(
+            entity.table.delete().where(entity.table.c.synced_at < started)
+        ).rowcount
+        state.last_full_sync_at = started
+
+    # A failed run leaves its committed pages behind, but not the new
+    # high-water mark or last_synced_at, so the next run re-reads them.
+    high_water_mark = db.execute(select(func.max(entity.table.c[entity.hwm_column]))).scalar()
+    state.high_water_mark = None if high_water_mark is None else entity.format_hwm(high_water_mark)
+    state.row_count = db.execute(select(func.count()).select_from(entity.table)).scalar()
+    state.table_name = entity.table_name
+    state.last_fetched = fetched
+    state.last_duration_ms = round((time.perf_counter() - clock) * 1000, 1)
+    state.last_attempt_at = started
+    state.last_synced_at = started
+    state.last_error = None
+    db.commit()
+
+    return {
+        "entity": entity.name,
+        "full": full,
+        "fetched": fetched,
+        "deleted": deleted,
+        "high_water_mark": state.high_water_mark,
+        "row_count": state.row_count,
+    }
+
+
+def _record_failure(db: Session, entity: SyncEntity, error: Exception):
+    try:
+        state = _get_state(db, entity)
+        state.last_attempt_at = _now()
+        state.last_error = str(error)[:1000]
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Failed to record sync failure for %s", entity.name)
+
+
+def sync_all(full: bool = False):
+    db = SessionLocal()
+    results = []
+    try:
+        for entity in SYNC_ENTITIES.values():
+            try:
+                result = sync_entity(db, entity, full)
+            except Exception as e:
+                db.rollback()
+                logger.exception("Failed to sync %s", entity.name)
+                _record_failure(db, entity, e)
+                continue
+            if result is not None:
+                logger.info("Synced BC mirror %s", result)
+                results.append(result)
+    finally:
+        db.close()
+    return results
+
+
+async def sync_forever(interval: int):
+    while True:
+        # sync_all() already survives a failing entity; this keeps the loop
+        # alive when the database itself is unreachable for a while.
+        try:
+            await run_in_threadpool(sync_all)
+        except Exception:
+            logger.exception("BC mirror sync failed, retrying in %ss", interval)
+        await asyncio.sleep(interval)
+
+
+def _synced_at(db: Session):
+    cached = state_cache.get("synced_at")
+    if cached is None:
+        cached = dict(db.execute(
+            select(models.BCSyncState.entity, models.BCSyncState.last_synced_at)
+        ).all())
+        state_cache.set("synced_at", cached)
+    return cached
+
+
+def mirror_is_fresh(db: Session, entities: Iterable[str]):
+    if BC_MIRROR_MAX_AGE <= 0:
+        return False
+    synced_at = _synced_at(db)
+    now = _now()
+    for name in entities:
+        last = _aware(synced_at.get(name))
+        if last is None:
+            return False
+        if (now - last).total_seconds() > BC_MIRROR_MAX_AGE:
+            return False
+    return True
+
+
+def _json_numbers(series: pd.Series) -> pd.Series:
+    """
+    A Numeric column typed the way the BC JSON path types it: int64 when
+    every value is a whole number, float64 once one is fractional or null.
+    """
+    values = [None if pd.isna(v) else int(v) if v == int(v) else float(v) for v in series]
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _quoted(columns):
+    # Mirror columns keep BC's mixed case names.
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+class MirrorQuery():
+    """SELECT over one entity's mirror table, the SQL side of an ODataQuery."""
+
+    def __init__(self, entity: str, select: Iterable[str], where: str = None,
+                 order_by: str = None, distinct_on: Iterable[str] = (), params: Dict = None):
+        self.entity = entity
+        self.select = tuple(select)
+        self.where = where
+        self.order_by = order_by
+        self.distinct_on = tuple(distinct_on)
+        self.params = params or {}
+
+    def statement(self):
+        table = SYNC_ENTITIES[self.entity].table_name
+        distinct = f"DISTINCT ON ({_quoted(self.distinct_on)}) " if self.distinct_on else ""
+        sql = f"SELECT {distinct}{_quoted(self.select)} FROM {table}"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        if self.order_by:
+            sql += f" ORDER BY {self.order_by}"
+        return text(sql)
+
+
+def mirror_dataframes(queries: Dict[str, MirrorQuery],
+                      date_columns: Iterable[str] = ()) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Run queries against the mirror tables, or return None when any entity
+    they read is not mirrored or not fresh, so the caller asks BC instead.
+    """
+    if any(query.entity not in SYNC_ENTITIES for query in queries.values()):
+        return None
+
+    try:
+        with engine.connect() as conn, Session(bind=conn) as db:
+            if not mirror_is_fresh(db, {query.entity for query in queries.values()}):
+                return None
+
+            dataframes = {}
+            for name, query in queries.items():
+                df = pd.read_sql(
+                    query.statement(), conn, params=query.params, coerce_float=False,
+                    parse_dates=[c for c in date_columns if c in query.select],
+                )
+                # Decimals would print differently from BC's JSON numbers
+                # (1049 vs 1049.0 once a join leaves gaps).
+                table = SYNC_ENTITIES[query.entity].table
+                for column in df.columns:
+                    if isinstance(table.c[column].type, Numeric):
+                        df[column] = _json_numbers(df[column])
+                dataframes[name] = df
+    except (SQLAlchemyError, pd.errors.DatabaseError):
+        logger.exception("Reading the BC mirror failed, falling back to BC")
+        return None
+    return dataframes
+
+
+def sync_metrics(db: Session):
+    now = _now()
+    states = {s.entity: s for s in db.query(models.BCSyncState).all()}
+    metrics = {}
+    for name, entity in SYNC_ENTITIES.items():
+        state = states.get(name)
+        last = _aware(state.last_synced_at) if state else None
+        lag = round((now - last).total_seconds(), 1) if last else None
+        metrics[name] = {
+            "table": entity.table_name,
+            "high_water_mark": state.high_water_mark if state else None,
+            "row_count": state.row_count if state else 0,
+            "last_fetched": state.last_fetched if state else None,
+            "last_duration_ms": state.last_duration_ms if state else None,
+            "last_attempt_at": state.last_attempt_at if state else None,
+            "last_synced_at": last,
+            "last_full_sync_at": state.last_full_sync_at if state else None,
+            "last_error": state.last_error if state else None,
+            "lag_seconds": lag,
+            "fresh": lag is not None and BC_MIRROR_MAX_AGE > 0 and lag <= BC_MIRROR_MAX_AGE,
+        }
+    return {"sync_seconds": BC_SYNC_SECONDS, "full_sync_seconds": BC_SYNC_FULL_SECONDS,
+            "mirror_max_age": BC_MIRROR_MAX_AGE, "entities": metrics}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for summary in sync_all(full="--full" in sys.argv[1:]):
+        print(summary)
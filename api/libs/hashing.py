@@ -1,6 +1,25 @@
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import dotenv_values
+import asyncio
+import threading
+import time
 
-pwd_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto")
+config = dotenv_values(".env")
+
+# bcrypt cost factor. Hashes made with a different cost are transparently
+# re-hashed on the next successful login.
+BCRYPT_ROUNDS = int(config.get("BCRYPT_ROUNDS") or 12)
+
+# Worker processes used for hashing off the request path, and how many
+# hash jobs may wait for a worker before new ones are refused.
+HASH_WORKERS = int(config.get("HASH_WORKERS") or 2)
+HASH_MAX_PENDING = int(config.get("HASH_MAX_PENDING") or 32)
+
+pwd_cxt = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                       bcrypt__rounds=BCRYPT_ROUNDS,
+                       bcrypt__min_rounds=BCRYPT_ROUNDS,
+                       bcrypt__max_rounds=BCRYPT_ROUNDS)
 
 
 class Hash():
@@ -9,3 +28,89 @@ class Hash():
 
     def verify(hashed_password, plainpassword):
         return pwd_cxt.verify(plainpassword, hashed_password)
+
+    def verify_and_update(hashed_password, plainpassword):
+        """Return (verified, new_hash); new_hash is None unless a rehash is due."""
+        return pwd_cxt.verify_and_update(plainpassword, hashed_password)
+
+
+class HashingBusy(Exception):
+    pass
+
+
+class HashingService():
+    """
+    Runs bcrypt in a bounded process pool so hashing bursts neither hold the
+    event loop nor starve the request threadpool.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    async def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashingBusy("Too many password hashing requests in progress")
+            self._pending += 1
+        start = time.perf_counter()
+        failed = True
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+            failed = False
+            return result
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._pending -= 1
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                    self._total_latency += latency
+                    self._max_latency = max(self._max_latency, latency)
+
+    async def bcrypt(self, password: str):
+        return await self._run(Hash.bcrypt, password)
+
+    async def verify_and_update(self, hashed_password, plainpassword):
+        return await self._run(Hash.verify_and_update, hashed_password, plainpassword)
+
+    def metrics(self):
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "queue_depth": self._pending,
+                "completed": completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_latency_ms": round(self._total_latency / completed * 1000, 2) if completed else 0.0,
+                "max_latency_ms": round(self._max_latency * 1000, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+hasher = HashingService(HASH_WORKERS, HASH_MAX_PENDING)
@@ -0,0 +1,58 @@
+from typing import Callable, Dict, Iterable, List
+
+import pandas as pd
+
+"""
+
+    Builds the integration JSON shape,
+
+        {"item_description": {"<code>": value, ...}, "data": {"<code>": value, ...}}
+
+    from a DataFrame and an integration's COLUMN_MAPPING, one column at a
+    time instead of one boxed row at a time.
+
+"""
+
+
+def _whole_second_datetimes(series: pd.Series):
+    if not pd.api.types.is_datetime64_dtype(series):
+        return False
+    return not ((series.dt.microsecond != 0) | (series.dt.nanosecond != 0)).any()
+
+
+def _column_values(series: pd.Series, cast: Callable) -> List:
+    if cast is str and _whole_second_datetimes(series):
+        # str(Timestamp) per value dominates otherwise; format the column at once.
+        return series.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("NaT").tolist()
+    # tolist() hands back Python scalars (Timestamp for datetimes, float nan
+    # for gaps), so str() gives the same text DataFrame.iterrows() did.
+    return list(map(cast, series.tolist()))
+
+
+def generate_json_output(df: pd.DataFrame, column_mapping: Dict[str, str],
+                         description_columns: Iterable[str],
+                         casts: Dict[str, Callable] = None) -> List[Dict]:
+    """
+    One entry per row of df. description_columns go under "item_description",
+    the other COLUMN_MAPPING columns under "data", in mapping order. Values
+    are str() unless casts names another conversion (e.g. float).
+    """
+    if df is None or df.empty:
+        return []
+
+    casts = casts or {}
+    description_columns = list(description_columns)
+    data_columns = [c for c in column_mapping if c not in description_columns]
+
+    def rows(columns):
+        if not columns:
+            return [()] * len(df)
+        return zip(*(_column_values(df[c], casts.get(c, str)) for c in columns))
+
+    description_keys = [column_mapping[c] for c in description_columns]
+    data_keys = [column_mapping[c] for c in data_columns]
+    return [
+        {"item_description": dict(zip(description_keys, description)),
+         "data": dict(zip(data_keys, data))}
+        for description, data in zip(rows(description_columns), rows(data_columns))
+    ]
@@ -0,0 +1,380 @@
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import pandas as pd
+from dotenv import dotenv_values
+
+from api.libs.bc_cache import UncachedResult
+from api.libs.bc_client import bc_client, ODataQuery
+from api.libs.bc_sync import MirrorQuery, mirror_dataframes
+from api.libs.json_output import generate_json_output
+
+"""
+
+    Declarative BC-to-form pipelines.
+
+    An integration is described by a JSON spec instead of its own
+    fetch / filter / dedupe / merge / project code:
+
+        {
+          "name": "line_clearance",
+          "params": {"since": {"days_ago": 60}},
+          "date_columns": ["Manufacturing_Date"],
+          "sources": {
+            "orders": {
+              "endpoint": "OshoProductionOrder",      # or "url_config": "<.env key>"
+              "mirror": "OshoProductionOrder",        # bc_sync entity, optional
+              "filters": [{"column": "AuxiliaryIndex1", "op": "eq", "value": "Released"}],
+              "rename": {"AuxiliaryIndex2": "Production_Order_No"},
+              "dedupe": ["Production_Order_No"],
+              "latest": {"key": ["serialNo"], "by": "Entry_No", "incremental": true},
+              "order_by": [["Entry_No", "desc"]],
+              "columns": ["Production_Order_No", "Item_Description"]
+            }
+          },
+          "base": "batches",
+          "joins": [{"source": "orders", "on": "Production_Order_No", "how": "inner"}],
+          "output": {
+            "description": ["Item_Description"],
+            "mapping": {"Item_Description": "3", "Production_Order_No": "14"},
+            "casts": {"Planned_Quantity": "float"}
+          }
+        }
+
+    Filters are pushed down, to BC as $filter or to the mirror as SQL, and
+    a filter value may be {"param": "<name>"}. Every source is fetched with
+    only the columns the spec uses ($select) and is projected to its
+    columns and join keys before it is merged. rename is applied first, so
+    every other entry, filters and order_by included, uses the renamed
+    columns; they are mapped back to BC names for $filter, $orderby and SQL.
+
+    A source that is deduplicated needs an order_by on at least one column
+    outside its dedupe key (or a latest rule). Its rows are sorted by it
+    before the first row per key is kept, so BC and the mirror keep the
+    same row whatever order they return rows in.
+
+    An incremental latest rule keeps the newest row per key between runs
+    and only asks for rows whose "by" column is above the highest one seen,
+    rebuilding from scratch every full_refresh_seconds (default 3600).
+
+"""
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = dotenv_values(".env")
+
+ODATA_OPS = {"eq": "eq", "ne": "ne", "gt": "gt", "ge": "ge", "lt": "lt", "le": "le"}
+SQL_OPS = {"eq": "=", "ne": "<>", "gt": ">", "ge": ">=", "lt": "<", "le": "<="}
+CASTS = {"str": str, "float": float, "int": int}
+
+
+def _odata_literal(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def latest_per_key(df: pd.DataFrame, key: List[str], by: str) -> pd.DataFrame:
+    """
+    The row with the highest `by` for every key, newest first. One hash
+    groupby pass over df; only the per-key winners get sorted.
+    """
+    df = df.dropna(subset=[by])
+    if not df.index.is_unique:
+        df = df.reset_index(drop=True)
+    winners = df.groupby(key, dropna=False, sort=False)[by].idxmax()
+    return df.loc[winners.to_numpy()].sort_values(by=by, ascending=False)
+
+
+def _resolve_param(spec):
+    if "days_ago" in spec:
+        return (datetime.datetime.now() - datetime.timedelta(days=spec["days_ago"])).date()
+    if "value" in spec:
+        return spec["value"]
+    raise ValueError(f"Unsupported pipeline param {spec}")
+
+
+class PipelineSource():
+
+    def __init__(self, name: str, spec: Dict):
+        self.name = name
+        self.endpoint = spec.get("endpoint")
+        self.url_config = spec.get("url_config")
+        self.mirror = spec.get("mirror")
+        self.filters = spec.get("filters", [])
+        self.rename = spec.get("rename", {})
+        self.dedupe = spec.get("dedupe", [])
+        self.latest = spec.get("latest")
+        self.order_by = spec.get("order_by", [])
+        self.columns = spec.get("columns", [])
+        self.join_keys = []
+
+        # Newest row per key kept between runs for an incremental latest rule.
+        self._latest_rows = None
+        self._latest_built_at = 0.0
+        self._latest_lock = threading.Lock()
+
+        for f in self.filters:
+            if f["op"] not in ODATA_OPS and f["op"] != "in":
+                raise ValueError(f"Unsupported filter op {f['op']!r} in source {name}")
+        if not self.endpoint and not self.url_config:
+            raise ValueError(f"Source {name} needs an endpoint or url_config")
+        if self.dedupe and not self.latest and \
+                not [column for column, _ in self.order_by if column not in self.dedupe]:
+            raise ValueError(f"Source {name} dedupes without ordering by a column outside the dedupe key, "
+                             "the row kept would be arbitrary")
+
+    def url(self):
+        if self.url_config:
+            base = config.get(self.url_config)
+            return f"{base}/{self.endpoint}" if self.endpoint else base
+        return f"{config.get('BC_BASE_URL')}/{self.endpoint}"
+
+    def needed_columns(self):
+        """Columns used downstream, after rename."""
+        needed = [*self.columns, *self.join_keys, *self.dedupe]
+        if self.latest:
+            needed += [*self.latest["key"], self.latest["by"]]
+        return list(dict.fromkeys(needed))
+
+    def fetch_columns(self):
+        """needed_columns() plus the order_by columns a dedupe is sorted by."""
+        columns = self.needed_columns()
+        if self.dedupe:
+            columns += [c for c, _ in self.order_by if c not in columns]
+        return columns
+
+    def select(self):
+        """fetch_columns() under their BC names."""
+        original = {new: old for old, new in self.rename.items()}
+        return [original.get(c, c) for c in self.fetch_columns()]
+
+    def _original(self, column):
+        return {new: old for old, new in self.rename.items()}.get(column, column)
+
+    def since(self):
+        """
+        Highest `by` value already applied when only newer rows need to be
+        fetched, or None when this source has to be read in full.
+        """
+        if not self.latest or not self.latest.get("incremental"):
+            return None
+        with self._latest_lock:
+            if self._latest_rows is None or self._latest_rows.empty:
+                return None
+            if time.monotonic() - self._latest_built_at >= self.latest.get("full_refresh_seconds", 3600):
+                return None
+            value = self._latest_rows[self.latest["by"]].max()
+        return value.item() if hasattr(value, "item") else value
+
+    def _filter_value(self, f, params):
+        value = f["value"]
+        if isinstance(value, dict):
+            return params[value["param"]]
+        return value
+
+    def odata_query(self, params: Dict, since=None) -> ODataQuery:
+        clauses = []
+        for f in self.filters:
+            value = self._filter_value(f, params)
+            column = self._original(f["column"])
+            if f["op"] == "in":
+                clauses.append("(" + " or ".join(f"{column} eq {_odata_literal(v)}" for v in value) + ")")
+            else:
+                clauses.append(f"{column} {ODATA_OPS[f['op']]} {_odata_literal(value)}")
+        if since is not None:
+            clauses.append(f"{self._original(self.latest['by'])} gt {_odata_literal(since)}")
+        orderby = ",".join(f"{self._original(column)} {direction}" for column, direction in self.order_by)
+        return ODataQuery(select=self.select(), filter=" and ".join(clauses) or None,
+                          orderby=orderby or None)
+
+    def mirror_query(self, params: Dict, since=None) -> MirrorQuery:
+        clauses, binds = [], {}
+        for i, f in enumerate(self.filters):
+            value = self._filter_value(f, params)
+            column = self._original(f["column"])
+            if f["op"] == "in":
+                names = [f"{self.name}_{i}_{j}" for j in range(len(value))]
+                binds.update(zip(names, value))
+                clauses.append(f'"{column}" IN ({", ".join(":" + n for n in names)})')
+            else:
+                binds[f"{self.name}_{i}"] = value
+                clauses.append(f'"{column}" {SQL_OPS[f["op"]]} :{self.name}_{i}')
+        if since is not None:
+            binds[f"{self.name}_since"] = since
+            clauses.append(f'"{self._original(self.latest["by"])}" > :{self.name}_since')
+
+        distinct_on, order_by = (), [(self._original(c), d) for c, d in self.order_by]
+        if self.latest:
+            # The newest row per key can be picked by Postgres directly.
+            distinct_on = [self._original(c) for c in self.latest["key"]]
+            order_by = [(c, "asc") for c in distinct_on] + [(self._original(self.latest["by"]), "desc")]
+        return MirrorQuery(
+            self.mirror,
+            select=self.select(),
+            where=" AND ".join(clauses) or None,
+            order_by=", ".join(f'"{c}" {d.upper()}' for c, d in order_by) or None,
+            distinct_on=distinct_on,
+            params=binds,
+        )
+
+    def prepare(self, df: Optional[pd.DataFrame], since=None) -> Optional[pd.DataFrame]:
+        """
+        rename, dedupe, keep latest per key, then prune to needed columns.
+        since is what since() returned for the fetch that produced df: df
+        then only holds newer rows and is folded into the kept state.
+        """
+        if self.latest and self.latest.get("incremental"):
+            return self._apply_latest(df, since)
+        if df is None or df.empty:
+            return None
+        df = df.rename(columns=self.rename)
+        if self.dedupe:
+            if self.order_by:
+                df = df.sort_values(by=[c for c, _ in self.order_by],
+                                    ascending=[d.lower() == "asc" for _, d in self.order_by],
+                                    kind="stable")
+            df = df.drop_duplicates(subset=self.dedupe, keep="first")
+        if self.latest:
+            df = latest_per_key(df, self.latest["key"], self.latest["by"])
+        return df[self.needed_columns()]
+
+    def _apply_latest(self, df: Optional[pd.DataFrame], since):
+        key, by = self.latest["key"], self.latest["by"]
+        if df is not None and not df.empty:
+            df = df.rename(columns=self.rename)[self.needed_columns()]
+            if self.dedupe:
+                df = df.drop_duplicates(subset=self.dedupe, keep="first")
+            df = latest_per_key(df, key, by)
+
+        with self._latest_lock:
+            if since is None:
+                # Full read: start over, unless it failed and there is nothing to start from.
+                if df is None or df.empty:
+                    return None
+                self._latest_rows = df
+                self._latest_built_at = time.monotonic()
+            elif df is not None and not df.empty:
+                # Rows above `since` beat the kept row for their key.
+                self._latest_rows = latest_per_key(
+                    pd.concat([self._latest_rows, df], ignore_index=True), key, by
+                )
+            elif df is None:
+                logger.warning(f"{self.name}: fetching new rows failed, serving the kept latest rows.")
+            rows = self._latest_rows
+        return None if rows is None or rows.empty else rows
+
+    def empty_frame(self):
+        return pd.DataFrame(columns=self.needed_columns())
+
+
+class Pipeline():
+
+    def __init__(self, spec: Dict):
+        self.name = spec["name"]
+        self.params = spec.get("params", {})
+        self.date_columns = spec.get("date_columns", [])
+        self.sources = {name: PipelineSource(name, s) for name, s in spec["sources"].items()}
+        self.base = spec["base"]
+        self.joins = spec.get("joins", [])
+        output = spec["output"]
+        self.column_mapping = output["mapping"]
+        self.description_columns = output["description"]
+        self.casts = {c: CASTS[cast] for c, cast in output.get("casts", {}).items()}
+
+        if self.base not in self.sources:
+            raise ValueError(f"Unknown base source {self.base!r} in pipeline {self.name}")
+        joined = [self.base]
+        for join in self.joins:
+            if join["source"] not in self.sources:
+                raise ValueError(f"Unknown join source {join['source']!r} in pipeline {self.name}")
+            left_on = join.get("left_on", join.get("on"))
+            right_on = join.get("right_on", join.get("on"))
+            # The join key has to survive pruning on both sides; the left
+            # one may come from the base or any source joined before.
+            self.sources[join["source"]].join_keys.append(right_on)
+            owner = next((s for s in joined if left_on in self.sources[s].columns), self.base)
+            self.sources[owner].join_keys.append(left_on)
+            joined.append(join["source"])
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def resolved_params(self):
+        return {name: _resolve_param(spec) for name, spec in self.params.items()}
+
+    def fetch(self, deadline: float = None, since: Dict = None) -> Dict[str, pd.DataFrame]:
+        """
+        The sources from the mirror while it is fresh, else from BC. since
+        maps a source to the value only newer rows are wanted above.
+        """
+        params = self.resolved_params()
+        since = since or {}
+        if all(source.mirror for source in self.sources.values()):
+            dataframes = mirror_dataframes(
+                {name: source.mirror_query(params, since.get(name)) for name, source in self.sources.items()},
+                self.date_columns,
+            )
+            if dataframes is not None:
+                return dataframes
+
+        fetched = bc_client.fetch_dataframes({
+            name: {"url": source.url(), "date_columns": self.date_columns,
+                   "query": source.odata_query(params, since.get(name))}
+            for name, source in self.sources.items()
+        }, deadline=deadline)
+        return {name: df for name, df in fetched.items() if df is not None}
+
+    def process(self, dataframes: Dict[str, pd.DataFrame], since: Dict = None) -> pd.DataFrame:
+        since = since or {}
+        df = self.sources[self.base].prepare(dataframes.get(self.base), since.get(self.base))
+        if df is None:
+            logger.warning(f"{self.name}: {self.base} is empty or missing.")
+            return pd.DataFrame()
+
+        for join in self.joins:
+            source = self.sources[join["source"]]
+            how = join.get("how", "inner")
+            right = source.prepare(dataframes.get(source.name), since.get(source.name))
+            if right is None:
+                if how == "inner":
+                    logger.warning(f"{self.name}: {source.name} is empty or missing.")
+                    return pd.DataFrame()
+                logger.warning(f"{self.name}: {source.name} is empty or missing, its columns will be empty.")
+                right = source.empty_frame()
+
+            left_on = join.get("left_on", join.get("on"))
+            right_on = join.get("right_on", join.get("on"))
+            df = df.merge(right, left_on=left_on, right_on=right_on, how=how)
+            if right_on != left_on:
+                df = df.drop(columns=[right_on])
+
+        logger.info(f"{self.name}: {len(df)} records after all joins.")
+        return df
+
+    def output(self, df: pd.DataFrame) -> List[Dict]:
+        return generate_json_output(df, self.column_mapping, self.description_columns, self.casts)
+
+    def run(self, deadline: float = None) -> List[Dict]:
+        """
+        The integration's output. Raises UncachedResult, carrying whatever
+        output could still be built, when a source could not be fetched.
+        """
+        since = {name: source.since() for name, source in self.sources.items()}
+        dataframes = self.fetch(deadline, since)
+        output = self.output(self.process(dataframes, since))
+        failed = [name for name in self.sources if name not in dataframes]
+        if failed:
+            raise UncachedResult(output, f"{self.name}: could not fetch {', '.join(failed)}")
+        return output
@@ -0,0 +1,107 @@
+from collections import deque
+import threading
+import time
+import uuid
+
+
+class MemoryWindowStore():
+    """Per-process sliding window of event timestamps per key."""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, events, cutoff):
+        while events and events[0] <= cutoff:
+            events.popleft()
+
+    def count(self, key, window: float):
+        """Return (events in window, timestamp of the oldest one)."""
+        now = time.time()
+        with self._lock:
+            events = self._events.get(key)
+            if not events:
+                return 0, None
+            self._prune(events, now - window)
+            if not events:
+                del self._events[key]
+                return 0, None
+            return len(events), events[0]
+
+    def add(self, key, window: float):
+        now = time.time()
+        with self._lock:
+            if key not in self._events and len(self._events) >= self.max_keys:
+                self._sweep(now - window)
+            events = self._events.setdefault(key, deque())
+            self._prune(events, now - window)
+            events.append(now)
+
+    def _sweep(self, cutoff):
+        for key in list(self._events):
+            events = self._events[key]
+            self._prune(events, cutoff)
+            if not events:
+                del self._events[key]
+        # Still full of live keys: drop the least recently touched ones.
+        while len(self._events) >= self.max_keys:
+            oldest = min(self._events, key=lambda k: self._events[k][-1])
+            del self._events[oldest]
+
+    def reset(self, key):
+        with self._lock:
+            self._events.pop(key, None)
+
+
+class RedisWindowStore():
+    """Sliding window kept in a Redis sorted set, shared by all workers."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def count(self, key, window: float):
+        now = time.time()
+        name = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(name, 0, now - window)
+        pipe.zcard(name)
+        pipe.zrange(name, 0, 0, withscores=True)
+        _, total, oldest = pipe.execute()
+        return total, (oldest[0][1] if oldest else None)
+
+    def add(self, key, window: float):
+        now = time.time()
+        name = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.zadd(name, {f"{now}:{uuid.uuid4().hex}": now})
+        pipe.expire(name, int(window) + 1)
+        pipe.execute()
+
+    def reset(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class SlidingWindowLimiter():
+    """Allows at most `limit` recorded events per key within `window` seconds."""
+
+    def __init__(self, store, limit: int, window: float):
+        self.store = store
+        self.limit = limit
+        self.window = window
+
+    def retry_after(self, key):
+        """Seconds until key may try again, 0 when it is not limited."""
+        total, oldest = self.store.count(key, self.window)
+        if total < self.limit:
+            return 0
+        return max(1, int(oldest + self.window - time.time()) + 1)
+
+    def record(self, key):
+        self.store.add(key, self.window)
+
+    def reset(self, key):
+        self.store.reset(key)
@@ -0,0 +1,24 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi import responses
+
+
+def _default(value):
+    # NUMERIC columns come back from asyncpg as Decimal, which orjson
+    # does not serialize natively.
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """
+    FastAPI's ORJSONResponse, also accepting Decimal values. Returning it
+    from an endpoint skips FastAPI's jsonable_encoder pass over the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
@@ -9,6 +9,7 @@ from sqlalchemy import (
     DateTime,
     Float,
     Date,
+    Numeric,
 )
 from api.database import Base
 
@@ -119,6 +120,138 @@ class GroupUser(Base):
     updated_at = Column(DateTime(timezone=True))
 
 
+class PrivilegeVersion(Base):
+    __table_args__ = table_args
+    __tablename__ = "eprivilege_version"
+
+    id = Column(Integer, primary_key=True, index=True)
+    id_company = Column(Integer, unique=True)
+    version = Column(Integer)
+    updated_at = Column(DateTime(timezone=True))
+
+
+class WhatsAppRollupState(Base):
+    __table_args__ = table_args
+    __tablename__ = "ewhatsapp_rollup_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    view_name = Column(String, unique=True)
+    table_name = Column(String)
+    high_water_mark = Column(BigInteger)
+    row_count = Column(BigInteger)
+    refreshed_at = Column(DateTime(timezone=True))
+    full_refreshed_at = Column(DateTime(timezone=True))
+
+
+class BCSyncState(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_sync_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String, unique=True)
+    table_name = Column(String)
+    high_water_mark = Column(String)
+    row_count = Column(BigInteger)
+    last_fetched = Column(BigInteger)
+    last_duration_ms = Column(Float)
+    last_attempt_at = Column(DateTime(timezone=True))
+    last_synced_at = Column(DateTime(timezone=True))
+    last_full_sync_at = Column(DateTime(timezone=True))
+    last_error = Column(String)
+    lease_until = Column(DateTime(timezone=True))
+
+
+"""
+
+    Local mirrors of Business Central collections, kept up to date by
+    api.libs.bc_sync. Column names are the BC field names so mirrored rows
+    read back into the same DataFrames the OData client builds.
+
+"""
+
+
+class BCProductionOrder(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_production_orders"
+
+    SystemId = Column(String, primary_key=True)
+    AuxiliaryIndex1 = Column(String, index=True)
+    AuxiliaryIndex2 = Column(String, index=True)
+    Item_Description = Column(String)
+    Planned_Quantity = Column(Numeric)
+    SystemModifiedAt = Column(DateTime(timezone=True), index=True)
+    synced_at = Column(DateTime(timezone=True))
+
+
+class BCProductionBatchLog(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_production_batch_log"
+
+    Entry_No = Column(BigInteger, primary_key=True)
+    Production_Order_No = Column(String, index=True)
+    Manufacturing_Date = Column(Date)
+    Bulk_Batch_No = Column(String)
+    Finished_Batch_No = Column(String)
+    Expiration_Date = Column(Date)
+    Type = Column(String)
+    synced_at = Column(DateTime(timezone=True))
+
+
+class BCPostedPurchaseReceipt(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_posted_purchase_receipts"
+
+    SystemId = Column(String, primary_key=True)
+    No = Column(String, index=True)
+    Order_No = Column(String)
+    Buy_from_Vendor_Name = Column(String)
+    Location_Code = Column(String)
+    Posting_Date = Column(Date, index=True)
+    Expected_Receipt_Date = Column(Date)
+    SystemModifiedAt = Column(DateTime(timezone=True), index=True)
+    synced_at = Column(DateTime(timezone=True))
+
+
+class BCPostedPurchaseReceiptLine(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_posted_purchase_receipt_lines"
+
+    SystemId = Column(String, primary_key=True)
+    Document_No = Column(String, index=True)
+    Line_No = Column(Integer)
+    Type = Column(String)
+    No = Column(String)
+    Description = Column(String)
+    Quantity = Column(Numeric)
+    Location_Code = Column(String)
+    Order_No = Column(String)
+    Expected_Receipt_Date = Column(Date)
+    SystemModifiedAt = Column(DateTime(timezone=True), index=True)
+    synced_at = Column(DateTime(timezone=True))
+
+
+class BCMaintenanceEntry(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_maintenance_entries"
+
+    Entry_No = Column(BigInteger, primary_key=True)
+    serialNo = Column(String, index=True)
+    value = Column(Numeric)
+    postingDate = Column(Date)
+    synced_at = Column(DateTime(timezone=True))
+
+
+class BCNextService(Base):
+    __table_args__ = table_args
+    __tablename__ = "ebc_next_service"
+
+    SystemId = Column(String, primary_key=True)
+    Serial_No = Column(String, index=True)
+    Next_Service_Value = Column(Numeric)
+    SystemModifiedAt = Column(DateTime(timezone=True), index=True)
+    synced_at = Column(DateTime(timezone=True))
+
+
 """
 
     Models for the compliance tool database tables.
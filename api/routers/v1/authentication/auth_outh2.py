@@ -3,15 +3,41 @@ from fastapi import (Depends, HTTPException,
 from fastapi.security import (
     OAuth2PasswordBearer,
 )
+from sqlalchemy.orm import Session
+from api import database, service
 from api.routers.v1.authentication import auth_token
+from api.utils.check_if_authorized import TokenUser, privilege_version
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def get_token_data(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    return auth_token.verify_token(token, credentials_exception)
+    return auth_token.decode_token(token, credentials_exception)
+
+def get_current_user(token_data: service.TokenData = Depends(get_token_data)):
+    return token_data.username
+
+def require_scopes(*scopes: str):
+    """
+    Dependency factory authorizing a request from the token's scopes claim.
+    Only the company privilege version is checked, and that lookup is cached,
+    so a valid token is normally authorized without touching the database.
+    Tokens issued before the company's last privilege change are refused.
+    """
+    def check_scopes(token_data: service.TokenData = Depends(get_token_data),
+                     db: Session = Depends(database.get_db)):
+        if token_data.version is None or \
+                token_data.version < privilege_version(db, token_data.id_company):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                detail="Token privileges are out of date, please log in again",
+                                headers={"WWW-Authenticate": "Bearer"})
+        if not set(scopes).issubset(token_data.scopes):
+            raise HTTPException(status_code=401, detail='Not Authorized')
+        return TokenUser(token_data)
+
+    return check_scopes
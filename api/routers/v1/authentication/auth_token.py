@@ -19,14 +19,21 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def verify_token(token: str, credentials_exception):
+def decode_token(token: str, credentials_exception):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
         token_scopes = payload.get("scopes", [])
-        token_data = service.TokenData(username=username)
-        return token_data.username
+        return service.TokenData(username=username,
+                                 scopes=token_scopes,
+                                 id_company=payload.get("cid"),
+                                 version=payload.get("pv"),
+                                 superuser=bool(payload.get("su")))
     except JWTError:
         raise credentials_exception
+
+
+def verify_token(token: str, credentials_exception):
+    return decode_token(token, credentials_exception).username
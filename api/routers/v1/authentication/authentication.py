@@ -1,41 +1,126 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from api import database, models
-from api.libs.hashing import Hash
+from api.libs.hashing import hasher, HashingBusy
+from api.libs.rate_limit import (MemoryWindowStore, RedisWindowStore,
+                                 SlidingWindowLimiter)
 from api.routers.v1.authentication import auth_token
-from api.utils.check_if_authorized import if_authorized
+from api.utils.check_if_authorized import get_active_user, load_privileges, privilege_version
+from api.utils import system_functions_registry
+from dotenv import dotenv_values
+import datetime
+
+config = dotenv_values(".env")
+
+# Failed logins allowed per username and per client IP within the window
+# before further attempts are refused without touching the database.
+LOGIN_WINDOW_SECONDS = int(config.get("LOGIN_WINDOW_SECONDS") or 300)
+LOGIN_MAX_FAILURES = int(config.get("LOGIN_MAX_FAILURES") or 5)
+LOGIN_IP_MAX_FAILURES = int(config.get("LOGIN_IP_MAX_FAILURES") or 20)
+
+if config.get("RATE_LIMIT_BACKEND") == "redis":
+    throttle_store = RedisWindowStore(config.get("REDIS_URL") or "redis://localhost:6379/0",
+                                      prefix="login:")
+else:
+    throttle_store = MemoryWindowStore()
+
+user_throttle = SlidingWindowLimiter(throttle_store, LOGIN_MAX_FAILURES, LOGIN_WINDOW_SECONDS)
+ip_throttle = SlidingWindowLimiter(throttle_store, LOGIN_IP_MAX_FAILURES, LOGIN_WINDOW_SECONDS)
 
 
 router = APIRouter(tags=["Authentication"], prefix="/login")
 
 
-@router.post("/")
-def login(
-    login: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(database.get_db)
-):
+# The limiter stores may do network I/O (Redis), so login calls these from
+# the threadpool rather than on the event loop.
+def throttle_retry_after(user_key: str, ip_key: str):
+    return max(user_throttle.retry_after(user_key), ip_throttle.retry_after(ip_key))
+
+
+def record_failed_login(user_key: str, ip_key: str):
+    user_throttle.record(user_key)
+    ip_throttle.record(ip_key)
+
+
+def find_user(username: str, db: Session):
     # Try to find the user by username OR email
-    user = (
+    return (
         db.query(models.User)
         .filter(
-            (models.User.user_username == login.username)
-            | (models.User.user_email == login.username)
+            (models.User.user_username == username)
+            | (models.User.user_email == username)
         )
         .first()
     )
 
-    if not user or not Hash.verify(user.user_password, login.password):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Incorrect username/email or password",
-        )
 
-    user_roles = if_authorized(user.user_username, db)
-    access_token = auth_token.create_access_token(data={"sub": user.user_username})
+def issue_token(user: models.User, new_hash, db: Session):
+    if new_hash:
+        # The stored hash used an outdated bcrypt cost, keep the fresh one.
+        user.user_password = new_hash
+        user.updated_at = datetime.datetime.now()
+        db.commit()
+
+    # Read the version before the privileges and skip both caches: a
+    # membership change landing in between then stales this token instead
+    # of letting it carry privileges older than its version.
+    version = privilege_version(db, user.id_company, use_cache=False)
+    user_roles = load_privileges(get_active_user(user.user_username, db), db)
+    scopes = system_functions_registry.func_names(user_roles, db)
+    access_token = auth_token.create_access_token(data={
+        "sub": user.user_username,
+        "scopes": scopes,
+        "cid": user.id_company,
+        "pv": version,
+        "su": bool(user.user_is_superuser),
+    })
 
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user_roles": user_roles,
+        "user_roles": sorted(user_roles),
     }
+
+
+@router.post("/")
+async def login(
+    request: Request,
+    login: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(database.get_db)
+):
+    user_key = "user:" + login.username.strip().lower()
+    ip_key = "ip:" + (request.client.host if request.client else "unknown")
+    retry_after = await run_in_threadpool(throttle_retry_after, user_key, ip_key)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts, please try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    user = await run_in_threadpool(find_user, login.username, db)
+
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await hasher.verify_and_update(
+                user.user_password, login.password
+            )
+        except HashingBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Login service is busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+
+    if not verified:
+        await run_in_threadpool(record_failed_login, user_key, ip_key)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incorrect username/email or password",
+        )
+
+    await run_in_threadpool(user_throttle.reset, user_key)
+    return await run_in_threadpool(issue_token, user, new_hash, db)
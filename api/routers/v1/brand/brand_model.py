@@ -1,11 +1,12 @@
 import json
 import requests
-from requests.auth import HTTPBasicAuth
 import pandas as pd
 from urllib.parse import quote
 import logging
 from typing import Dict, Optional, List
 from dotenv import dotenv_values
+from api.libs.bc_client import bc_client
+from api.libs.json_output import generate_json_output as build_json_output
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,163 +19,17 @@ config = dotenv_values(".env")
 
 
 # Configuration
-BC_USERNAME = config.get("BC_USERNAME")
-BC_PASSWORD = config.get("BC_PASSWORD")
 VEHICLES_INSPECTION_URL = config.get("VEHICLES_INSPECTION_URL")
 NEXTSERVICE_URL = config.get("NEXTSERVICE_URL")
 
-VERIFY_SSL = True
-
-print(VEHICLES_INSPECTION_URL, BC_USERNAME, BC_PASSWORD)
-
 COLUMN_MAPPING = {
     "serialNo": "507",
     "value": "509",
     "Next_Service_Value": "510",
 }
 
-logger.info(f"Using username: {BC_USERNAME}")
-logger.info(f"SSL Verification: {'Enabled' if VERIFY_SSL else 'DISABLED (INSECURE)'}")
-
-
-def fetch_odata_data(
-    base_url: str, auth_session: requests.Session, verify_ssl: bool
-) -> Optional[pd.DataFrame]:
-    """
-    Fetches data from the specified Business Central OData endpoint.
-
-    Args:
-        base_url (str): The base URL for the Business Central OData API
-        auth_session (requests.Session): A requests session pre-configured with authentication
-        verify_ssl (bool): Whether to verify SSL certificates
-
-    Returns:
-        A DataFrame with the fetched data, or None if an error occurred
-    """
-
-    full_url = f"{base_url}"
-    logger.info(f"Attempting to fetch data from: {full_url}")
-
-    try:
-        response = auth_session.get(
-            full_url, headers={"Accept": "application/json"}, verify=verify_ssl
-        )
-        response.raise_for_status()
-
-        data = response.json()
-        records = data.get("value", [])
-
-        if not records:
-            logger.info(
-                f"No records found in the 'value' array for the vehicles inspection endpoint."
-            )
-            return pd.DataFrame()
-
-        df = pd.DataFrame(records)
-        
-        # print(df.head())
-        
-        # Convert common date columns
-        for col in ["postingDate"]:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-
-        logger.info(
-            f"Successfully fetched {len(df)} records from vehicles inspection endpoint."
-        )
-        return df
-
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP Error fetching data from vehicles inspection endpoint: {e}")
-        logger.error(f"Status Code: {e.response.status_code}")
-        if e.response.text and len(e.response.text) < 1000:
-            logger.error(f"Response Body: {e.response.text}")
-        else:
-            logger.error(f"Response Body (truncated): {e.response.text[:500]}...")
-    except requests.exceptions.ConnectionError as e:
-        logger.error(
-            f"Connection Error fetching data from vehicles inspection endpoint: {e}"
-        )
-    except ValueError as e:
-        logger.error(
-            f"Error parsing JSON response from vehicles inspection endpoint: {e}"
-        )
-    except Exception as e:
-        logger.error(
-            f"Unexpected error fetching data from vehicles inspection endpoint: {e}"
-        )
+DATE_COLUMNS = ["postingDate"]
 
-    return None
-
-
-def fetch_nextservice_data(
-    base_url: str, auth_session: requests.Session, verify_ssl: bool
-) -> Optional[pd.DataFrame]:
-    """
-    Fetches data from the specified Business Central OData endpoint.
-
-    Args:
-        base_url (str): The base URL for the Business Central OData API
-        auth_session (requests.Session): A requests session pre-configured with authentication
-        verify_ssl (bool): Whether to verify SSL certificates
-
-    Returns:
-        A DataFrame with the fetched data, or None if an error occurred
-    """
-
-    full_url = f"{base_url}"
-    logger.info(f"Attempting to fetch data from: {full_url}")
-
-    try:
-        response = auth_session.get(
-            full_url, headers={"Accept": "application/json"}, verify=verify_ssl
-        )
-        response.raise_for_status()
-
-        data = response.json()
-        records = data.get("value", [])
-
-        if not records:
-            logger.info(
-                f"No records found in the 'value' array for the vehicles inspection endpoint."
-            )
-            return pd.DataFrame()
-
-        df = pd.DataFrame(records)
-        
-        # print(df.head())
-        
-        # Convert common date columns
-        for col in ["postingDate"]:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-
-        logger.info(
-            f"Successfully fetched {len(df)} records from vehicles inspection endpoint."
-        )
-        return df
-
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"HTTP Error fetching data from vehicles inspection endpoint: {e}")
-        logger.error(f"Status Code: {e.response.status_code}")
-        if e.response.text and len(e.response.text) < 1000:
-            logger.error(f"Response Body: {e.response.text}")
-        else:
-            logger.error(f"Response Body (truncated): {e.response.text[:500]}...")
-    except requests.exceptions.ConnectionError as e:
-        logger.error(
-            f"Connection Error fetching data from vehicles inspection endpoint: {e}"
-        )
-    except ValueError as e:
-        logger.error(
-            f"Error parsing JSON response from vehicles inspection endpoint: {e}"
-        )
-    except Exception as e:
-        logger.error(
-            f"Unexpected error fetching data from vehicles inspection endpoint: {e}"
-        )
-
-    return None
 
 def generate_json_output(final_output_df: pd.DataFrame) -> List[Dict]:
     """
@@ -186,22 +41,7 @@ def generate_json_output(final_output_df: pd.DataFrame) -> List[Dict]:
     Returns:
         List of dictionaries in the new format
     """
-    json_output = []
-
-    if not final_output_df.empty:
-        output_columns = ["serialNo", "value", "Next_Service_Value"]
-
-        for _, row in final_output_df[output_columns].iterrows():
-            entry = {
-                "item_description": {COLUMN_MAPPING["serialNo"]: str(row["serialNo"])},
-                "data": {
-                    COLUMN_MAPPING["value"]: str(row["value"]),
-                    COLUMN_MAPPING["Next_Service_Value"]: str(row["Next_Service_Value"]),
-                },
-            }
-            json_output.append(entry)
-
-    return json_output
+    return build_json_output(final_output_df, COLUMN_MAPPING, ["serialNo"])
 
 
 # print(generate_json_output)
@@ -240,7 +80,6 @@ def push_maintenance_to_endpoint(df):
     """
     logger.info(f"Attempting to push {len(df)} records to {VEHICLES_INSPECTION_URL}...")
     headers = {"Content-Type": "application/json"}
-    auth = HTTPBasicAuth(BC_USERNAME, BC_PASSWORD)
 
     for index, row in df.iterrows():
         # Sanitize and prepare the payload
@@ -269,8 +108,8 @@ def push_maintenance_to_endpoint(df):
 
         try:
             # Use the `json` parameter to automatically handle headers and serialization
-            response = requests.post(
-                VEHICLES_INSPECTION_URL, json=payload, headers=headers, auth=auth
+            response = bc_client.post(
+                VEHICLES_INSPECTION_URL, json=payload, headers=headers
             )
 
             if response.status_code == 201:
@@ -1,5 +1,7 @@
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api import database, models, service
 import logging
 from api.routers.v1.authentication.auth_outh2 import get_current_user
@@ -23,18 +25,19 @@ file_handler.setFormatter(fmt=formatter)
 logger.addHandler(hdlr=file_handler)
 
 
-def get_all(current_user: service.User = Depends(get_current_user), db: Session = Depends(database.get_db)):
+async def get_all(current_user: service.User, db: AsyncSession):
     
     #  select FormRowsLogs table where instance_id = 11545 and is_active = True
     brand_data = (
-    db.query(models.FormRowsLogs)
-    .filter(
-        models.FormRowsLogs.instance_id == 11545,
-        models.FormRowsLogs.is_active.is_(True)
-    )
-    .order_by(models.FormRowsLogs.id.asc())
-    .all()
-)
+        await db.execute(
+            select(models.FormRowsLogs.q_one, models.FormRowsLogs.q_two)
+            .filter(
+                models.FormRowsLogs.instance_id == 11545,
+                models.FormRowsLogs.is_active.is_(True)
+            )
+            .order_by(models.FormRowsLogs.id.asc())
+        )
+    ).all()
  
     # print(brand_data)
 
@@ -53,6 +56,3 @@ def get_all(current_user: service.User = Depends(get_current_user), db: Session
         )
 
     return result
-
-    
-
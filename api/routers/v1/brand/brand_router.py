@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from api.routers.v1.brand import brand_repository as vi
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api import service, database
 from api.routers.v1.authentication.auth_outh2 import get_current_user
 from typing import List
@@ -11,10 +12,10 @@ router = APIRouter(prefix="/api/v1/brand", tags=["Brands"])
 @router.get(
     "/", status_code=status.HTTP_200_OK, response_model=List[service.Brand]
 )
-def get_all_brands(
+async def get_all_brands(
     current_user: service.User = Depends(get_current_user),
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    return vi.get_all(current_user, db)
+    return await vi.get_all(current_user, db)
 
 
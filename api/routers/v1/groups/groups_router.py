@@ -3,7 +3,8 @@ from fastapi import (APIRouter, Depends,
 from api.routers.v1.groups import groups_repository
 from sqlalchemy.orm import Session
 from api import service, database
-from api.routers.v1.authentication.auth_outh2 import get_current_user
+from api.routers.v1.authentication.auth_outh2 import require_scopes
+from api.utils.check_if_authorized import TokenUser
 from typing import List
 
 router = APIRouter(
@@ -13,36 +14,36 @@ router = APIRouter(
 @router.get('/', status_code=status.HTTP_200_OK,
         response_model=List[service.Groups])
 def get_all_groups(db: Session = Depends(database.get_db),
-                      current_user: service.User = Depends(get_current_user)):
-    return groups_repository.get_all(db, current_user)
+                      auth: TokenUser = Depends(require_scopes("Can_View_Groups"))):
+    return groups_repository.get_all(db, auth)
 
 @router.get('/{group_name}', status_code=status.HTTP_200_OK,
         response_model=service.Groups)
 def get_group(group_name, db: Session = Depends(database.get_db),
-                      current_user: service.User = Depends(get_current_user)):
-    return groups_repository.get_one(group_name, db, current_user)
+                      auth: TokenUser = Depends(require_scopes("Can_View_Group"))):
+    return groups_repository.get_one(group_name, db, auth)
 
 @router.post('/', status_code=status.HTTP_201_CREATED)
 def create_group(roles: service.Groups, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return groups_repository.create(roles, db, current_user)
+                auth: TokenUser = Depends(require_scopes("Can_Create_Group"))):
+    return groups_repository.create(roles, db, auth)
 
 @router.put('/{group_name}', status_code=status.HTTP_202_ACCEPTED)
 def update_group(group_name, groups: service.Groups, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return groups_repository.update(group_name, groups, db, current_user)
+                auth: TokenUser = Depends(require_scopes("Can_Update_Group"))):
+    return groups_repository.update(group_name, groups, db, auth)
 
 @router.delete('/{group_name}',status_code=status.HTTP_204_NO_CONTENT)
 def delete_group(group_name, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return groups_repository.destroy(group_name, db, current_user)
+                auth: TokenUser = Depends(require_scopes("Can_Delete_Group"))):
+    return groups_repository.destroy(group_name, db, auth)
 
 @router.post('/{group_name}', status_code=status.HTTP_201_CREATED)
 def create_role_in_group(group_name, group_priv: service.GroupRoles, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return groups_repository.create_grp_role(group_name, group_priv, db, current_user)
+                auth: TokenUser = Depends(require_scopes("Can_Add_Role_To_Group"))):
+    return groups_repository.create_grp_role(group_name, group_priv, db, auth)
 
 @router.post('/add_user/{username}', status_code=status.HTTP_201_CREATED)
 def create_user_in_group(username, grp_usr: service.UserGroup, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return groups_repository.create_grp_users(username, grp_usr, db, current_user)
\ No newline at end of file
+                auth: TokenUser = Depends(require_scopes("Can_Add_User_To_Group"))):
+    return groups_repository.create_grp_users(username, grp_usr, db, auth)
\ No newline at end of file
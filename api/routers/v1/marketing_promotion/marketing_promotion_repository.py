@@ -1,5 +1,7 @@
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api import database, models, service
 import logging
 from api.routers.v1.authentication.auth_outh2 import get_current_user
@@ -98,12 +100,13 @@ def build_get_all_func(item_key: int, data_key: int, instance_id: int):
     Dynamically create a repository function that fetches and formats marketing promo data.
     """
 
-    def func(db: Session = database.get_db()):
+    async def func(db: AsyncSession):
         promo_data = (
-            db.query(models.FormRowsLogs)
-            .filter(models.FormRowsLogs.instance_id == instance_id)
-            .all()
-        )
+            await db.execute(
+                select(models.FormRowsLogs.q_one, models.FormRowsLogs.q_two)
+                .filter(models.FormRowsLogs.instance_id == instance_id)
+            )
+        ).all()
 
         formatted_data: List[MarketingPromotion] = []
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, status, HTTPException
 from api.routers.v1.marketing_promotion import marketing_promotion_repository as vi
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api import service, database
 from api.routers.v1.authentication.auth_outh2 import get_current_user
 from typing import List
@@ -49,8 +50,8 @@ for i, name in enumerate(names, start=1):
         # Optional: skip or raise if not implemented in vi
         continue
 
-    async def endpoint(db: Session = Depends(database.get_db), func=repo_func):
-        return func(db)
+    async def endpoint(db: AsyncSession = Depends(database.get_async_db), func=repo_func):
+        return await func(db)
 
     router.add_api_route(
         f"/{name}",
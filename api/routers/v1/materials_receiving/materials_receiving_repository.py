@@ -5,6 +5,7 @@ import logging
 from api.routers.v1.authentication.auth_outh2 import get_current_user
 from api.routers.v1.materials_receiving.materials_receiving_model import get_production_data
 from api.utils.check_if_authorized import if_authorized
+from api.libs.bc_cache import bc_cache
 import datetime
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,7 @@ file_handler.setFormatter(fmt=formatter)
 logger.addHandler(hdlr=file_handler)
 
 def get_all(current_user: service.User = Depends(get_current_user)):
-    production_data = get_production_data()
+    production_data = bc_cache.get_or_load("materials_receiving", get_production_data)
     
     # Transform the data to match the LineClearance model
     materials_receiving_data = [
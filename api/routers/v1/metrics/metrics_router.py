@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, status
+from api import database
+from api.libs.hashing import hasher
+from api.libs.bc_cache import bc_cache
+from api.libs import bc_sync
+from sqlalchemy.orm import Session
+from api.routers.v1.authentication.auth_outh2 import require_scopes
+from api.utils.check_if_authorized import TokenUser
+
+router = APIRouter(
+    prefix="/api/v1/metrics",
+    tags=['Metrics']
+)
+
+@router.get('/hashing', status_code=status.HTTP_200_OK)
+def get_hashing_metrics(auth: TokenUser = Depends(require_scopes("Can_View_Metrics"))):
+    return hasher.metrics()
+
+@router.get('/db_pool', status_code=status.HTTP_200_OK)
+def get_db_pool_metrics(auth: TokenUser = Depends(require_scopes("Can_View_Metrics"))):
+    return database.pool_metrics()
+
+@router.get('/bc_cache', status_code=status.HTTP_200_OK)
+def get_bc_cache_metrics(auth: TokenUser = Depends(require_scopes("Can_View_Metrics"))):
+    return bc_cache.metrics()
+
+@router.get('/bc_sync', status_code=status.HTTP_200_OK)
+def get_bc_sync_metrics(db: Session = Depends(database.get_db),
+                        auth: TokenUser = Depends(require_scopes("Can_View_Metrics"))):
+    return bc_sync.sync_metrics(db)
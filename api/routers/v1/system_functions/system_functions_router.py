@@ -3,7 +3,8 @@ from fastapi import (APIRouter, Depends,
 from api.routers.v1.system_functions import system_functions_repository
 from sqlalchemy.orm import Session
 from api import service, database
-from api.routers.v1.authentication.auth_outh2 import get_current_user
+from api.routers.v1.authentication.auth_outh2 import require_scopes
+from api.utils.check_if_authorized import TokenUser
 from typing import List
 
 router = APIRouter(
@@ -13,11 +14,11 @@ router = APIRouter(
 @router.get('/', status_code=status.HTTP_200_OK,
         response_model=List[service.SystemFunctions])
 def get_all_functions(db: Session = Depends(database.get_db),
-                      current_user: service.User = Depends(get_current_user)):
-    return system_functions_repository.get_all(db, current_user)
+                      auth: TokenUser = Depends(require_scopes("Can_View_System_Functions"))):
+    return system_functions_repository.get_all(db, auth)
 
 @router.get('/{system_function}', status_code=status.HTTP_200_OK,
         response_model=service.SystemFunctions)
 def get_system_function(system_function, db: Session = Depends(database.get_db),
-                      current_user: service.User = Depends(get_current_user)):
-    return system_functions_repository.get_one(system_function, db, current_user)
\ No newline at end of file
+                      auth: TokenUser = Depends(require_scopes("Can_View_System_Function"))):
+    return system_functions_repository.get_one(system_function, db, auth)
\ No newline at end of file
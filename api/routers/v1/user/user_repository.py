@@ -1,19 +1,11 @@
 from api import models, service
-from api.libs.hashing import Hash
 from fastapi import HTTPException, status
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from api.utils.check_if_authorized import if_authorized
+from api.utils.check_if_authorized import TokenUser, invalidate_privileges
 import datetime
 
-def create(user: service.User, db: Session, current_user):
-    priv_name = "Can_Create_User"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
-    get_current_user = db.query(models.User).filter(
-        models.User.user_username == current_user).first()
+def check_available(user: service.User, db: Session):
     check_user = db.query(models.User).filter(
         models.User.user_username == user.user_username).first()
     if check_user:
@@ -24,11 +16,12 @@ def create(user: service.User, db: Session, current_user):
     if check_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='email is invalid or already taken')  
-    get_current_user = db.query(models.User).filter(
-        models.User.user_username == current_user
-    ).first()
+
+def create(user: service.User, db: Session, auth: TokenUser):
+    # user_router runs check_available() before hashing; the unique
+    # username/email columns catch a user created in between.
     get_id_roles = db.query(models.CompanyRoles).filter(
-        models.CompanyRoles.id_company == get_current_user.id_company
+        models.CompanyRoles.id_company == auth.id_company
     ).filter(
         models.CompanyRoles.company_role_status == True
     ).all()
@@ -47,7 +40,8 @@ def create(user: service.User, db: Session, current_user):
             user_username = user.user_username,
             user_gender = user.user_gender,
             user_phone = user.user_phone,
-            user_password = Hash.bcrypt(user.user_password), 
+            # Hashed on the hashing pool by user_router before we get here.
+            user_password = user.user_password, 
             user_email=user.user_email,
             user_address = user.user_address,
             user_joindate = datetime.datetime.now(),
@@ -55,8 +49,8 @@ def create(user: service.User, db: Session, current_user):
             id_role = user.id_role,
             created_at=datetime.datetime.now(),
             updated_at=datetime.datetime.now(),
-            created_by=current_user,
-            id_company=get_current_user.id_company
+            created_by=auth.username,
+            id_company=auth.id_company
         )
         db.add(new_user)
         db.commit()
@@ -74,35 +68,20 @@ def create(user: service.User, db: Session, current_user):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
       
-def fetchone(username, db: Session, current_user):
-    priv_name = "Can_View_User"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
-    is_active = db.query(models.User).filter(
-        models.User.user_username == current_user).filter(models.User.user_status == True).first()
-    if not is_active:
-        raise HTTPException(status_code=401, detail='Not Authorized')
-    if current_user != username:
+def fetchone(username, db: Session, auth: TokenUser):
+    if auth.username != username:
         raise HTTPException(status_code=401,
                             detail='Not authorized') 
     user = db.query(models.User).filter(models.User.user_username == username).first() 
     return user
 
-def update(user: service.UpdateUser, db: Session, current_user):
-    priv_name = "Can_Update_User"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
+def update(user: service.UpdateUser, db: Session, auth: TokenUser):
     updated_user = db.query(models.User).filter(
-        models.User.user_username == current_user)
+        models.User.user_username == auth.username)
     if not updated_user.first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"username {current_user} was not found") 
+                            detail=f"username {auth.username} was not found") 
     try:
-        user.user_password = Hash.bcrypt(user.user_password)
         updated_user.update(user.dict())
         db.commit()
         return {'message': 'updated'}
@@ -111,19 +90,13 @@ def update(user: service.UpdateUser, db: Session, current_user):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
     
-def update_to_admin(username, user: service.UpdateUserAdmin, db: Session, current_user):
-    priv_name = "Can_Update_User_To_Admin"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
+def update_to_admin(username, user: service.UpdateUserAdmin, db: Session, auth: TokenUser):
     updated_user = db.query(models.User).filter(
         models.User.user_username == username)
     if not updated_user.first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"username {current_user} was not found") 
+                            detail=f"username {auth.username} was not found") 
     try:
-        user.user_password = Hash.bcrypt(user.user_password)
         updated_user.update(user.dict())
         db.commit()
         return {'message': 'updated'}
@@ -132,48 +105,27 @@ def update_to_admin(username, user: service.UpdateUserAdmin, db: Session, curren
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-def fetchall(db: Session, current_user):
-    priv_name = "Can_View_Users"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
-    is_active= db.query(models.User).filter(
-        models.User.user_username == current_user).filter(models.User.user_status == True).first()
-    if not is_active:
-        raise HTTPException(status_code=401,
-                            detail='Not authorized')
+def fetchall(db: Session, auth: TokenUser):
     users = db.query(models.User).filter(
-        models.User.id_company == is_active.id_company
+        models.User.id_company == auth.id_company
     ).all()
     return users
 
-def destroy(username, db: Session, current_user):
-    is_superuser = db.query(models.User).filter(
-        models.User.user_username == current_user).filter(models.User.user_is_superuser == True)
-    if is_superuser.first():
+def destroy(username, db: Session, auth: TokenUser):
+    if auth.is_superuser:
         raise HTTPException(status_code=401, detail='Not Authorized')
-    priv_name = "Can_Delete_User"
-    priv = db.query(models.SystemFunction).filter(models.SystemFunction.func_name == priv_name).first()
-    all_system_func = if_authorized(current_user, db)
-    if priv.id not in all_system_func:
-        raise HTTPException(status_code=401, detail='Not Authorized')
-    is_active= db.query(models.User).filter(
-        models.User.user_username == current_user).filter(models.User.user_status == True).first()
-    if not is_active:
-        raise HTTPException(status_code=401,
-                            detail='Not authorized')
     delete_user = db.query(models.User).filter(models.User.user_username == username).first()
     if not delete_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"user with username {username} was not found")
-    if current_user != delete_user.user_username:
+    if auth.username != delete_user.user_username:
         raise HTTPException(status_code=401,
                             detail='Not authorized')
     try:
         delete_user.user_status = False
         db.commit()
         db.refresh(delete_user)
+        invalidate_privileges(db, delete_user.id_company, username)
         return {'message': 'user deleted successfully'}
     except SQLAlchemyError as e:
         db.rollback()
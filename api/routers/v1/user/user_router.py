@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from api import service, database
+from api.libs.hashing import hasher, HashingBusy
 from api.routers.v1.user import user_repository
-from api.routers.v1.authentication.auth_outh2 import get_current_user
+from api.routers.v1.authentication.auth_outh2 import require_scopes
+from api.utils.check_if_authorized import TokenUser
 from typing import List
 
 router = APIRouter(
@@ -10,32 +13,47 @@ router = APIRouter(
     tags=['User']
 )
 
+async def hash_password(password: str):
+    try:
+        return await hasher.bcrypt(password)
+    except HashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="User service is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+
 @router.post('/', status_code=status.HTTP_201_CREATED)
-def create_user(user: service.User, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return user_repository.create(user, db, current_user)
+async def create_user(user: service.User, db: Session = Depends(database.get_db),
+                auth: TokenUser = Depends(require_scopes("Can_Create_User"))):
+    # Refuse taken usernames/emails before spending a bcrypt job on them.
+    await run_in_threadpool(user_repository.check_available, user, db)
+    user.user_password = await hash_password(user.user_password)
+    return await run_in_threadpool(user_repository.create, user, db, auth)
 
 @router.get('/{username}',status_code=status.HTTP_200_OK,response_model=service.ShowUser)
 def fetch_user(username, db: Session = Depends(database.get_db),
-               current_user: service.User = Depends(get_current_user)):
-    return user_repository.fetchone(username, db, current_user)
+               auth: TokenUser = Depends(require_scopes("Can_View_User"))):
+    return user_repository.fetchone(username, db, auth)
 
 @router.get('/',status_code=status.HTTP_200_OK,response_model=List[service.ShowUser])
 def fetch_users(db: Session = Depends(database.get_db),
-               current_user: service.User = Depends(get_current_user)):
-    return user_repository.fetchall(db, current_user)
+               auth: TokenUser = Depends(require_scopes("Can_View_Users"))):
+    return user_repository.fetchall(db, auth)
 
 @router.put('/', status_code=status.HTTP_202_ACCEPTED)
-def update_user(user: service.UpdateUser, db: Session = Depends(database.get_db),
-                   current_user: service.User = Depends(get_current_user)):
-    return user_repository.update(user, db, current_user)
+async def update_user(user: service.UpdateUser, db: Session = Depends(database.get_db),
+                   auth: TokenUser = Depends(require_scopes("Can_Update_User"))):
+    user.user_password = await hash_password(user.user_password)
+    return await run_in_threadpool(user_repository.update, user, db, auth)
 
 @router.put('/{username}', status_code=status.HTTP_202_ACCEPTED)
-def update_user_admin(username, user: service.UpdateUserAdmin, db: Session = Depends(database.get_db),
-                   current_user: service.User = Depends(get_current_user)):
-    return user_repository.update_to_admin(username, user, db, current_user)
+async def update_user_admin(username, user: service.UpdateUserAdmin, db: Session = Depends(database.get_db),
+                   auth: TokenUser = Depends(require_scopes("Can_Update_User_To_Admin"))):
+    user.user_password = await hash_password(user.user_password)
+    return await run_in_threadpool(user_repository.update_to_admin, username, user, db, auth)
 
 @router.delete('/{username}',status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(username, db: Session = Depends(database.get_db),
-                current_user: service.User = Depends(get_current_user)):
-    return user_repository.destroy(username, db, current_user)
\ No newline at end of file
+                auth: TokenUser = Depends(require_scopes("Can_Delete_User"))):
+    return user_repository.destroy(username, db, auth)
\ No newline at end of file
@@ -8,6 +8,7 @@ from api.routers.v1.vehicles_inspection.vehicles_inspection_model import (
     push_maintenance_to_endpoint,
 )
 from api.utils.check_if_authorized import if_authorized
+from api.libs.bc_cache import bc_cache
 import datetime
 from datetime import datetime
 import pandas as pd
@@ -24,7 +25,7 @@ logger.addHandler(hdlr=file_handler)
 
 
 def get_all(current_user: service.User = Depends(get_current_user)):
-    vehicles_data = get_vehicles_data()
+    vehicles_data = bc_cache.get_or_load("vehicles_inspection", get_vehicles_data)
 
     # Transform the data to match the LineClearance model
     vehicles_inspection_data = [
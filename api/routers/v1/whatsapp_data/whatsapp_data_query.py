@@ -0,0 +1,194 @@
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+
+"""
+
+    Query specs for the WhatsApp chat views.
+
+    A ViewQuery knows a view's columns, the filters it accepts, the columns
+    it may be sorted or grouped by and its key column. Statements are
+    compiled once per filter combination and kept in an LRU, so a request
+    only picks its parameters instead of building SQL strings.
+
+    Every statement reads from `source`, which is the view itself or its
+    rollup table (see whatsapp_data_rollup) when that one is fresh.
+
+"""
+
+ALLOWED_SORT_DIR = {"asc", "desc"}
+
+PERIOD_COLUMNS = {
+    "day": "day_time",
+    "month": "first_day_of_month",
+}
+
+
+class ViewQuery():
+
+    def __init__(self, view: str, columns, key_column: str, filters: Dict[str, Tuple[str, str]],
+                 sort_fields: Dict[str, str], group_columns: Dict[str, str] = None,
+                 rollup_table: str = None, rollup_indexes=()):
+        self.view = view
+        self.rollup_table = rollup_table
+        self.rollup_indexes = tuple(rollup_indexes)
+        self.columns = tuple(columns)
+        self.key_column = key_column
+        self.filters = filters
+        self.sort_fields = sort_fields
+        self.group_columns = group_columns or {}
+        self.select_list = ", ".join(f'"{c}"' for c in self.columns)
+
+    def filter_keys(self, active_filters: Dict[str, Any]):
+        """Active filters this view accepts, in spec order, as a cache key."""
+        return tuple(k for k in self.filters if k in active_filters)
+
+    def params(self, active_filters: Dict[str, Any]):
+        return {k: active_filters[k] for k in self.filter_keys(active_filters)}
+
+    def _where(self, filter_keys, extra=()):
+        clauses = [f"{self.filters[k][0]} {self.filters[k][1]} :{k}" for k in filter_keys]
+        clauses.extend(extra)
+        if not clauses:
+            return ""
+        return "WHERE " + " AND ".join(clauses)
+
+    def sort_column(self, sort_by: str = None, sort_dir: str = "asc", keyset: bool = False):
+        """Validate sort_by/sort_dir and return the column to order by."""
+        if sort_dir not in ALLOWED_SORT_DIR:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"sort_dir must be one of {sorted(ALLOWED_SORT_DIR)}",
+            )
+        if sort_by is None or sort_by == self.key_column:
+            return self.key_column
+        if sort_by not in self.sort_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"sort_by must be one of {sorted([self.key_column, *self.sort_fields])}",
+            )
+        if keyset:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"cursor pagination is only available when sorting by {self.key_column}",
+            )
+        return self.sort_fields[sort_by]
+
+    @lru_cache(maxsize=256)
+    def page_statement(self, filter_keys, sort_column: str, sort_dir: str, keyset: bool,
+                       source: str = None):
+        extra = ()
+        if keyset:
+            extra = (f"{self.key_column} {'>' if sort_dir == 'asc' else '<'} :after",)
+
+        order_by = f'"{sort_column}" {sort_dir}'
+        if sort_column != self.key_column:
+            # Tie-break on the key so pages are stable.
+            order_by += f", {self.key_column} {sort_dir}"
+
+        return text(f"""
+            SELECT {self.select_list}
+            FROM {source or self.view}
+            {self._where(filter_keys, extra)}
+            ORDER BY {order_by}
+            LIMIT :limit OFFSET :offset
+        """)
+
+    @lru_cache(maxsize=128)
+    def count_statement(self, filter_keys, source: str = None):
+        return text(f"SELECT COUNT(1) FROM {source or self.view} {self._where(filter_keys)}")
+
+    @lru_cache(maxsize=128)
+    def estimate_statement(self, filter_keys, source: str = None):
+        return text(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {source or self.view} {self._where(filter_keys)}")
+
+    @lru_cache(maxsize=128)
+    def export_statement(self, filter_keys, source: str = None):
+        return text(f"""
+            SELECT {self.select_list}
+            FROM {source or self.view}
+            {self._where(filter_keys)}
+            ORDER BY {self.key_column} asc
+        """)
+
+    @lru_cache(maxsize=128)
+    def aggregate_statement(self, filter_keys, group_by: str, period: str, with_sentiment: bool,
+                            source: str = None):
+        group_column = self.group_columns[group_by]
+        period_column = PERIOD_COLUMNS[period]
+        sentiment_sql = ", AVG(sentiment) AS avg_sentiment" if with_sentiment else ""
+        return text(f"""
+            SELECT {period_column} AS period, {group_column} AS key,
+                   COUNT(1) AS count{sentiment_sql}
+            FROM {source or self.view}
+            {self._where(filter_keys)}
+            GROUP BY {period_column}, {group_column}
+            ORDER BY {period_column} asc, {group_column} asc
+        """)
+
+
+CS_QUERY = ViewQuery(
+    view="cb_jipange_whatsapp.v_customer_service_chats",
+    columns=[
+        "chat_id", "customer_support_id", "customer_support", "client_id",
+        "client_name", "client_phone", "chat_originator", "chat_message",
+        "timestamp", "day_time", "first_day_of_month", "ratings",
+    ],
+    key_column="chat_id",
+    rollup_table="intergrations_iconia.wa_customer_service_chats",
+    rollup_indexes=["day_time", "client_phone", "customer_support_id"],
+    filters={
+        "client_phone": ("client_phone", "="),
+        "client_id": ("client_id", "="),
+        "customer_support_id": ("customer_support_id", "="),
+        "rating": ("ratings", "="),
+
+        # date range
+        "day_time_from": ("day_time", ">="),
+        "day_time_to": ("day_time", "<="),
+    },
+    sort_fields={
+        "timestamp": "timestamp",
+        "ratings": "ratings",
+        "customer_support": "customer_support",
+    },
+    group_columns={
+        "ratings": "ratings",
+        "customer_support": "customer_support",
+    },
+)
+
+AI_QUERY = ViewQuery(
+    view="cb_jipange_whatsapp.v_ai_chats",
+    columns=[
+        "id", "msg_classification", "sentiment", "sentiment_meaning",
+        "timestamp", "day_time", "first_day_of_month", "product",
+        "client_phone", "client_name", "town", "two_word_summary", "human", "ai",
+    ],
+    key_column="id",
+    rollup_table="intergrations_iconia.wa_ai_chats",
+    rollup_indexes=["day_time", "client_phone", "product", "town"],
+    filters={
+        "client_phone": ("client_phone", "="),
+        "product": ("product", "="),
+        "town": ("town", "="),
+
+        # date range
+        "day_time_from": ("day_time", ">="),
+        "day_time_to": ("day_time", "<="),
+    },
+    sort_fields={
+        "timestamp": "timestamp",
+        "sentiment": "sentiment",
+        "product": "product",
+        "town": "town",
+    },
+    group_columns={
+        "sentiment": "sentiment",
+        "msg_classification": "msg_classification",
+        "product": "product",
+        "town": "town",
+    },
+)
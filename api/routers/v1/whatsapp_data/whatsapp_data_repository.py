@@ -1,245 +1,423 @@
-from datetime import date
+from datetime import date, datetime
+import base64
+import csv
+import io
+import json
 import logging
 from typing import Dict, Any, List
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
+from dotenv import dotenv_values
 
 from api import models, service
+from api.database import AsyncSessionLocal
+from api.libs.cache import TTLCache
 from api.utils.check_if_authorized import if_authorized
 from api.routers.v1.whatsapp_data.whatsapp_data_model import WhatsAppChat, AIChat
+from api.routers.v1.whatsapp_data.whatsapp_data_query import ViewQuery, CS_QUERY, AI_QUERY
+from api.routers.v1.whatsapp_data.whatsapp_data_rollup import rollup_source
 
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+config = dotenv_values(".env")
 
-def get_cs_messages(
-    *,
-    client_phone: str | None,
-    client_id: int | None,
-    customer_support_id: int | None,
-    rating: str | None,
-    page: int,
-    page_size: int,
-    day_time_from: date | None,
-    day_time_to: date | None,
-    db: Session,
-    current_user: service.User,
-):
-    filters = {
-        "client_phone": client_phone,
-        "client_id": client_id,
-        "customer_support_id": customer_support_id,
-        "rating": rating,
-        "day_time_from": day_time_from,
-        "day_time_to": day_time_to,
-    }
+# total_records for a given view and filter set is reused for this many
+# seconds, so paging through a listing counts the rows once.
+WA_COUNT_CACHE_TTL = int(config.get("WA_COUNT_CACHE_TTL") or 60)
+WA_COUNT_CACHE_SIZE = int(config.get("WA_COUNT_CACHE_SIZE") or 512)
 
-    active_filters = {k: v for k, v in filters.items() if v is not None}
+count_cache = TTLCache(maxsize=WA_COUNT_CACHE_SIZE, ttl=WA_COUNT_CACHE_TTL)
 
-    where_clauses: List[str] = []
-    params: Dict[str, Any] = {}
+COUNT_MODES = ("exact", "estimate", "none")
 
-    FILTER_MAP = {
-        "client_phone": ("client_phone", "="),
-        "client_id": ("client_id", "="),
-        "customer_support_id": ("customer_support_id", "="),
-        "rating": ("ratings", "="),
+# Aggregate results are shared by every dashboard asking the same question
+# for this many seconds.
+WA_AGG_CACHE_TTL = int(config.get("WA_AGG_CACHE_TTL") or 300)
+aggregate_cache = TTLCache(maxsize=WA_COUNT_CACHE_SIZE, ttl=WA_AGG_CACHE_TTL)
 
-        # date range
-        "day_time_from": ("day_time", ">="),
-        "day_time_to": ("day_time", "<="),
-    }
 
+def check_columns(query: ViewQuery, model):
+    """
+    Listings return the view rows as plain dicts instead of building a model
+    per row, so the selected columns must match the model once, up front.
+    """
+    if set(query.columns) != set(model.model_fields):
+        raise RuntimeError(
+            f"{query.view} columns {sorted(query.columns)} do not match "
+            f"{model.__name__} fields {sorted(model.model_fields)}"
+        )
+
+
+check_columns(CS_QUERY, WhatsAppChat)
+check_columns(AI_QUERY, AIChat)
+
+# Rows fetched per round trip while streaming an export.
+WA_EXPORT_BATCH_SIZE = int(config.get("WA_EXPORT_BATCH_SIZE") or 2000)
 
-    for key, column in FILTER_MAP.items():
-        if key in active_filters:
-            where_clauses.append(f"{column[0]} {column[1]} :{key}")
-            params[key] = active_filters[key]
-
-    where_sql = ""
-    if where_clauses:
-        where_sql = "WHERE " + " AND ".join(where_clauses)
-
-    limit = page_size
-    offset = (page - 1) * page_size
-
-    print(f"Where SQL: {where_sql}")
-
-    data_sql = f"""
-        SELECT
-            chat_id,
-            customer_support_id,
-            customer_support,
-            client_id,
-            client_name,
-            client_phone,
-            chat_originator,
-            chat_message,
-            "timestamp",
-            day_time,
-            first_day_of_month,
-            ratings
-        FROM cb_jipange_whatsapp.v_customer_service_chats
-        {where_sql}
-        ORDER BY chat_id asc
-        LIMIT :limit OFFSET :offset
+
+def encode_cursor(last_key: int) -> str:
+    raw = json.dumps({"after": last_key}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        after = json.loads(base64.urlsafe_b64decode(padded))["after"]
+        if not isinstance(after, int):
+            raise ValueError(after)
+        return after
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+async def count_records(db: AsyncSession, query: ViewQuery,
+                        active_filters: Dict[str, Any], count_mode: str = "exact",
+                        source: str = None):
     """
+    total_records for a listing.
 
-    count_sql = f"""
-        SELECT COUNT(1)
-        FROM cb_jipange_whatsapp.v_customer_service_chats
-        {where_sql}
+    exact    - COUNT(1), cached per view, source and filter set
+    estimate - the planner's row estimate, no scan
+    none     - skip counting, returns None
     """
+    if count_mode == "none":
+        return None
+
+    key = (query.view, source, count_mode, tuple(sorted(active_filters.items())))
+    total = count_cache.get(key)
+    if total is not None:
+        return total
+
+    filter_keys = query.filter_keys(active_filters)
+    params = query.params(active_filters)
+    if count_mode == "estimate":
+        plan = (await db.execute(query.estimate_statement(filter_keys, source), params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        total = int(plan[0]["Plan"]["Plan Rows"])
+    else:
+        total = (await db.execute(query.count_statement(filter_keys, source), params)).scalar()
+
+    count_cache.set(key, total)
+    return total
+
+
+async def list_rows(
+    *,
+    query: ViewQuery,
+    label: str,
+    active_filters: Dict[str, Any],
+    page: int,
+    page_size: int,
+    cursor: str | None,
+    count_mode: str,
+    sort_by: str | None,
+    sort_dir: str,
+    db: AsyncSession,
+    current_user: service.User,
+):
+    keyset = cursor is not None
+    sort_column = query.sort_column(sort_by, sort_dir, keyset)
+    filter_keys = query.filter_keys(active_filters)
+
+    # Keyset mode seeks past the last seen key instead of scanning and
+    # discarding OFFSET rows; the count keeps the filter-only WHERE.
+    params = query.params(active_filters)
+    params["limit"] = page_size
+    params["offset"] = 0 if keyset else (page - 1) * page_size
+    if keyset:
+        params["after"] = decode_cursor(cursor)
 
     try:
-        total_records = db.execute(
-            text(count_sql),
-            params
-        ).scalar()
+        source = await rollup_source(db, query)
+        total_records = await count_records(db, query, active_filters, count_mode, source)
 
-        rows = db.execute(
-            text(data_sql),
-            {**params, "limit": limit, "offset": offset}
-        ).mappings().all()
+        rows = (await db.execute(
+            query.page_statement(filter_keys, sort_column, sort_dir, keyset, source),
+            params
+        )).mappings().all()
 
         logger.info(
-            "Fetched %s WhatsApp chats | filters=%s | user=%s",
+            "Fetched %s %s | filters=%s | user=%s",
             len(rows),
+            label,
             active_filters,
             current_user,
         )
 
+        next_cursor = None
+        if len(rows) == page_size and sort_column == query.key_column:
+            next_cursor = encode_cursor(rows[-1][query.key_column])
+
         return {
-            "data": [WhatsAppChat(**row) for row in rows],
-            "page": page,
+            "data": [dict(row) for row in rows],
+            "page": None if keyset else page,
             "page_size": page_size,
             "total_records": total_records,
+            "count_mode": count_mode,
+            "next_cursor": next_cursor,
             "applied_filters": active_filters,
         }
 
     except Exception as e:
-        logger.exception("Failed to fetch WhatsApp chats")
+        logger.exception("Failed to fetch %s", label)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         )
 
 
+async def get_cs_messages(
+    *,
+    client_phone: str | None,
+    client_id: int | None,
+    customer_support_id: int | None,
+    rating: str | None,
+    page: int,
+    page_size: int,
+    cursor: str | None = None,
+    count_mode: str = "exact",
+    sort_by: str | None = None,
+    sort_dir: str = "asc",
+    day_time_from: date | None,
+    day_time_to: date | None,
+    db: AsyncSession,
+    current_user: service.User,
+):
+    filters = {
+        "client_phone": client_phone,
+        "client_id": client_id,
+        "customer_support_id": customer_support_id,
+        "rating": rating,
+        "day_time_from": day_time_from,
+        "day_time_to": day_time_to,
+    }
 
-
-def get_chat_ai_messages(
+    return await list_rows(
+        query=CS_QUERY,
+        label="WhatsApp chats",
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count_mode=count_mode,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
+        db=db,
+        current_user=current_user,
+    )
+
+
+async def get_chat_ai_messages(
     *,
     client_phone: str | None,
-    # client_id: int | None,
-    # customer_support_id: int | None,
-    # rating: int | None,
     page: int,
     page_size: int,
+    cursor: str | None = None,
+    count_mode: str = "exact",
+    sort_by: str | None = None,
+    sort_dir: str = "asc",
     day_time_from: date | None,
     day_time_to: date | None,
-    db: Session,
+    db: AsyncSession,
     current_user: service.User,
 ):
     filters = {
         "client_phone": client_phone,
-        # "client_id": client_id,
-        # "customer_support_id": customer_support_id,
-        # "rating": rating,
         "day_time_from": day_time_from,
         "day_time_to": day_time_to,
     }
 
-    active_filters = {k: v for k, v in filters.items() if v is not None}
+    return await list_rows(
+        query=AI_QUERY,
+        label="AI chats",
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count_mode=count_mode,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
+        db=db,
+        current_user=current_user,
+    )
 
-    where_clauses: List[str] = []
-    params: Dict[str, Any] = {}
 
-    FILTER_MAP = {
-        "client_phone": ("client_phone", "="),
-        # "client_id": ("client_id", "="),
-        # "customer_support_id": ("customer_support_id", "="),
-        # "rating": ("ratings", "="),
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
 
-        # date range
-        "day_time_from": ("day_time", ">="),
-        "day_time_to": ("day_time", "<="),
-    }
+
+def _encode_ndjson(columns, rows):
+    return "".join(
+        json.dumps(dict(zip(columns, row)), default=_json_default) + "\n"
+        for row in rows
+    )
 
 
-    for key, column in FILTER_MAP.items():
-        if key in active_filters:
-            where_clauses.append(f"{column[0]} {column[1]} :{key}")
-            params[key] = active_filters[key]
-
-    where_sql = ""
-    if where_clauses:
-        where_sql = "WHERE " + " AND ".join(where_clauses)
-
-    limit = page_size
-    offset = (page - 1) * page_size
-
-    print(f"Where SQL: {where_sql}")
-
-    data_sql = f"""
-        SELECT id, 
-        msg_classification, 
-        sentiment, 
-        sentiment_meaning, 
-        "timestamp", 
-        day_time, 
-        first_day_of_month, 
-        product, 
-        client_phone, 
-        client_name, 
-        town, 
-        two_word_summary, 
-        human, 
-        ai
-        FROM cb_jipange_whatsapp.v_ai_chats
-        {where_sql}
-        ORDER BY id asc
-        LIMIT :limit OFFSET :offset
+def _encode_csv(columns, rows):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+async def export_rows(
+    *,
+    query: ViewQuery,
+    active_filters: Dict[str, Any],
+    fmt: str,
+    current_user: service.User,
+):
     """
+    Stream every matching row of a view as NDJSON or CSV.
 
-    count_sql = f"""
-        SELECT COUNT(1)
-        FROM cb_jipange_whatsapp.v_ai_chats
-        {where_sql}
+    The generator owns its session because the request scoped one is closed
+    before a StreamingResponse body is sent. Rows come from a server side
+    cursor in WA_EXPORT_BATCH_SIZE batches, so memory does not grow with the
+    size of the range.
     """
+    filter_keys = query.filter_keys(active_filters)
+    params = query.params(active_filters)
+    columns = list(query.columns)
+    encode = _encode_csv if fmt == "csv" else _encode_ndjson
+
+    async def generate():
+        total = 0
+        if fmt == "csv":
+            buf = io.StringIO()
+            csv.writer(buf).writerow(columns)
+            yield buf.getvalue()
+
+        async with AsyncSessionLocal() as session:
+            source = await rollup_source(session, query)
+            result = await session.stream(
+                query.export_statement(filter_keys, source), params,
+                execution_options={"yield_per": WA_EXPORT_BATCH_SIZE},
+            )
+            async for rows in result.partitions():
+                total += len(rows)
+                yield encode(columns, rows)
 
-    try:
-        total_records = db.execute(
-            text(count_sql),
-            params
-        ).scalar()
+        logger.info(
+            "Exported %s rows from %s | filters=%s | user=%s",
+            total,
+            query.view,
+            active_filters,
+            current_user,
+        )
+
+    return generate()
+
+
+async def export_cs_messages(*, active_filters: Dict[str, Any], fmt: str,
+                             current_user: service.User):
+    return await export_rows(
+        query=CS_QUERY,
+        active_filters=active_filters,
+        fmt=fmt,
+        current_user=current_user,
+    )
+
+
+async def export_chat_ai_messages(*, active_filters: Dict[str, Any], fmt: str,
+                                  current_user: service.User):
+    return await export_rows(
+        query=AI_QUERY,
+        active_filters=active_filters,
+        fmt=fmt,
+        current_user=current_user,
+    )
 
-        rows = db.execute(
-            text(data_sql),
-            {**params, "limit": limit, "offset": offset}
-        ).mappings().all()
+
+async def aggregate_rows(
+    *,
+    query: ViewQuery,
+    group_by: str,
+    period: str,
+    active_filters: Dict[str, Any],
+    with_sentiment: bool,
+    db: AsyncSession,
+    current_user: service.User,
+):
+    """
+    Row counts per period and group_by value, computed with GROUP BY in
+    Postgres and cached for WA_AGG_CACHE_TTL seconds.
+    """
+    key = (query.view, group_by, period, tuple(sorted(active_filters.items())))
+    series = aggregate_cache.get(key)
+
+    if series is None:
+        try:
+            source = await rollup_source(db, query)
+            aggregate_sql = query.aggregate_statement(
+                query.filter_keys(active_filters), group_by, period, with_sentiment, source
+            )
+            rows = (await db.execute(aggregate_sql, query.params(active_filters))).mappings().all()
+        except Exception as e:
+            logger.exception("Failed to aggregate %s", query.view)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e),
+            )
+
+        series = []
+        for row in rows:
+            point = {"period": row["period"], "key": row["key"], "count": row["count"]}
+            if with_sentiment:
+                avg = row["avg_sentiment"]
+                point["avg_sentiment"] = None if avg is None else round(float(avg), 3)
+            series.append(point)
+        aggregate_cache.set(key, series)
 
         logger.info(
-            "Fetched %s AI chats | filters=%s | user=%s",
-            len(rows),
+            "Aggregated %s by %s/%s into %s points | filters=%s | user=%s",
+            query.view,
+            period,
+            group_by,
+            len(series),
             active_filters,
             current_user,
         )
 
-        return {
-            "data": [AIChat(**row) for row in rows],
-            "page": page,
-            "page_size": page_size,
-            "total_records": total_records,
-            "applied_filters": active_filters,
-        }
+    return {
+        "group_by": group_by,
+        "period": period,
+        "series": series,
+        "applied_filters": active_filters,
+    }
 
-    except Exception as e:
-        logger.exception("Failed to fetch AI chats")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e),
-        )
-        
\ No newline at end of file
+
+async def aggregate_cs_messages(*, group_by: str, period: str,
+                                active_filters: Dict[str, Any],
+                                db: AsyncSession, current_user: service.User):
+    return await aggregate_rows(
+        query=CS_QUERY,
+        group_by=group_by,
+        period=period,
+        active_filters=active_filters,
+        with_sentiment=False,
+        db=db,
+        current_user=current_user,
+    )
+
+
+async def aggregate_chat_ai_messages(*, group_by: str, period: str,
+                                     active_filters: Dict[str, Any],
+                                     db: AsyncSession, current_user: service.User):
+    return await aggregate_rows(
+        query=AI_QUERY,
+        group_by=group_by,
+        period=period,
+        active_filters=active_filters,
+        with_sentiment=True,
+        db=db,
+        current_user=current_user,
+    )
@@ -0,0 +1,214 @@
+import asyncio
+import datetime
+import logging
+import sys
+import zlib
+
+from dotenv import dotenv_values
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from api import models
+from api.database import SessionLocal
+from api.libs.cache import TTLCache
+from api.routers.v1.whatsapp_data.whatsapp_data_query import ViewQuery, CS_QUERY, AI_QUERY
+
+"""
+
+    Rollup tables for the WhatsApp chat views.
+
+    Each view in ROLLUP_QUERIES is copied into a plain indexed table
+    (ViewQuery.rollup_table). A refresh only appends rows whose key is above
+    the high-water mark kept in ewhatsapp_rollup_state, and every
+    WA_ROLLUP_FULL_REFRESH_SECONDS it reloads the table from the view so
+    edits to older chats (ratings and the like) are picked up.
+
+    The repository reads the rollup instead of the view while its last
+    refresh is younger than WA_ROLLUP_MAX_AGE seconds and its last full
+    refresh younger than WA_ROLLUP_FULL_REFRESH_SECONDS + WA_ROLLUP_MAX_AGE,
+    which bounds how long an edited chat can be served from the rollup.
+
+    Refresh once, e.g. from cron:
+
+        python -m api.routers.v1.whatsapp_data.whatsapp_data_rollup [--full]
+
+    or set WA_ROLLUP_REFRESH_SECONDS to have the API refresh in the background.
+
+"""
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+config = dotenv_values(".env")
+
+WA_ROLLUP_MAX_AGE = int(config.get("WA_ROLLUP_MAX_AGE") or 900)
+WA_ROLLUP_REFRESH_SECONDS = int(config.get("WA_ROLLUP_REFRESH_SECONDS") or 0)
+WA_ROLLUP_FULL_REFRESH_SECONDS = int(config.get("WA_ROLLUP_FULL_REFRESH_SECONDS") or 3600)
+
+ROLLUP_QUERIES = (CS_QUERY, AI_QUERY)
+
+# Rollup state as seen by readers, re-read at most this often.
+state_cache = TTLCache(maxsize=16, ttl=15)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _age(moment: datetime.datetime):
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return (_now() - moment).total_seconds()
+
+
+def _bare_name(table: str):
+    return table.split(".")[-1]
+
+
+def ensure_rollup_table(db: Session, query: ViewQuery):
+    table = query.rollup_table
+    name = _bare_name(table)
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table} AS "
+        f"SELECT {query.select_list} FROM {query.view} WITH NO DATA"
+    ))
+    db.execute(text(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_{query.key_column}_key "
+        f"ON {table} ({query.key_column})"
+    ))
+    for column in query.rollup_indexes:
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_{column}_idx ON {table} ({column})"))
+
+
+def refresh_rollup(db: Session, query: ViewQuery, full: bool = False):
+    """
+    Bring query.rollup_table up to date with its view in one transaction.
+    Returns a summary dict, or None when another worker is refreshing it.
+    """
+    # Several API workers may run the background refresh; only one of them
+    # touches a given rollup at a time.
+    lock_id = zlib.crc32(query.rollup_table.encode())
+    if not db.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": lock_id}).scalar():
+        db.rollback()
+        return None
+
+    ensure_rollup_table(db, query)
+
+    state = (
+        db.query(models.WhatsAppRollupState)
+        .filter(models.WhatsAppRollupState.view_name == query.view)
+        .first()
+    )
+    now = _now()
+    if state is None:
+        state = models.WhatsAppRollupState(view_name=query.view, table_name=query.rollup_table,
+                                           high_water_mark=0, row_count=0)
+        db.add(state)
+
+    full = (
+        full
+        or state.full_refreshed_at is None
+        or (now - state.full_refreshed_at).total_seconds() >= WA_ROLLUP_FULL_REFRESH_SECONDS
+    )
+
+    columns = query.select_list
+    if full:
+        # DELETE rather than TRUNCATE so readers keep seeing the old rows
+        # until this transaction commits.
+        db.execute(text(f"DELETE FROM {query.rollup_table}"))
+        inserted = db.execute(text(
+            f"INSERT INTO {query.rollup_table} ({columns}) SELECT {columns} FROM {query.view}"
+        )).rowcount
+        state.row_count = inserted
+        state.full_refreshed_at = now
+    else:
+        inserted = db.execute(text(
+            f"INSERT INTO {query.rollup_table} ({columns}) "
+            f"SELECT {columns} FROM {query.view} WHERE {query.key_column} > :hwm "
+            f"ON CONFLICT ({query.key_column}) DO NOTHING"
+        ), {"hwm": state.high_water_mark or 0}).rowcount
+        state.row_count = (state.row_count or 0) + inserted
+
+    state.high_water_mark = db.execute(text(
+        f"SELECT COALESCE(MAX({query.key_column}), 0) FROM {query.rollup_table}"
+    )).scalar()
+    state.table_name = query.rollup_table
+    state.refreshed_at = now
+    db.commit()
+
+    return {
+        "view": query.view,
+        "table": query.rollup_table,
+        "full": full,
+        "inserted": inserted,
+        "high_water_mark": state.high_water_mark,
+        "row_count": state.row_count,
+    }
+
+
+def refresh_all(full: bool = False):
+    db = SessionLocal()
+    results = []
+    try:
+        for query in ROLLUP_QUERIES:
+            try:
+                result = refresh_rollup(db, query, full)
+            except Exception:
+                db.rollback()
+                logger.exception("Failed to refresh rollup for %s", query.view)
+                continue
+            if result is not None:
+                logger.info("Refreshed rollup %s", result)
+                results.append(result)
+    finally:
+        db.close()
+    return results
+
+
+async def refresh_forever(interval: int):
+    while True:
+        # refresh_all() already survives a failing view; this keeps the loop
+        # alive when the database itself is unreachable for a while.
+        try:
+            await run_in_threadpool(refresh_all)
+        except Exception:
+            logger.exception("Rollup refresh failed, retrying in %ss", interval)
+        await asyncio.sleep(interval)
+
+
+async def rollup_source(db: AsyncSession, query: ViewQuery):
+    """
+    The rollup table to read for query when it is fresh enough, else None
+    so the caller reads the view.
+    """
+    if WA_ROLLUP_MAX_AGE <= 0 or not query.rollup_table:
+        return None
+
+    cached = state_cache.get(query.view)
+    if cached is None:
+        cached = (await db.execute(
+            select(models.WhatsAppRollupState.refreshed_at,
+                   models.WhatsAppRollupState.full_refreshed_at)
+            .where(models.WhatsAppRollupState.view_name == query.view)
+        )).first() or (None, None)
+        cached = tuple(cached)
+        state_cache.set(query.view, cached)
+
+    refreshed_at, full_refreshed_at = cached
+    if refreshed_at is None or full_refreshed_at is None:
+        return None
+    # Incremental passes only append new chats; edits to rolled up rows
+    # arrive with the next full refresh, so that one must be recent too.
+    if _age(refreshed_at) > WA_ROLLUP_MAX_AGE:
+        return None
+    if _age(full_refreshed_at) > WA_ROLLUP_FULL_REFRESH_SECONDS + WA_ROLLUP_MAX_AGE:
+        return None
+    return query.rollup_table
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for summary in refresh_all(full="--full" in sys.argv[1:]):
+        print(summary)
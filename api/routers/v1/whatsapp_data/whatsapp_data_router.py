@@ -1,13 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from typing import Optional, Dict, Any, Literal
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import date
 
 # IMPORTANT: Ensure this import matches your database setup
-from api.database import get_db 
+from api.database import get_async_db
 from api.routers.v1.authentication.auth_outh2 import get_current_user
 from api import service
+from api.libs.responses import ORJSONResponse
 from api.routers.v1.whatsapp_data import whatsapp_data_repository
+from api.routers.v1.whatsapp_data.whatsapp_data_query import ALLOWED_SORT_DIR, CS_QUERY, AI_QUERY
 # from api.service import WhatsAppChat
 
 router = APIRouter(
@@ -15,16 +18,13 @@ router = APIRouter(
     tags=["WhatsApp Chats"]
 )
 
-ALLOWED_SORT_FIELDS = {
-    "timestamp": "timestamp",
-    "ratings": "ratings",
-    "customer_support": "customer_support"
-}
-ALLOWED_SORT_DIR = {"asc", "desc"}
+ALLOWED_SORT_FIELDS = CS_QUERY.sort_fields
+AI_ALLOWED_SORT_FIELDS = AI_QUERY.sort_fields
 
 
-@router.get("/customer_service", status_code=status.HTTP_200_OK, summary="Get customer service chat messages")
-def get_cs_messages(
+@router.get("/customer_service", status_code=status.HTTP_200_OK, summary="Get customer service chat messages",
+            response_class=ORJSONResponse)
+async def get_cs_messages(
     day_time_from: Optional[date] = Query(None),
     day_time_to: Optional[date] = Query(None),
     client_phone: Optional[str] = Query(
@@ -41,31 +41,46 @@ def get_cs_messages(
     ),
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="Opaque next_cursor from a previous page; takes precedence over page"
+    ),
+    count: Literal["exact", "estimate", "none"] = Query(
+        "exact", description="exact: cached COUNT, estimate: planner row estimate, none: skip total_records"
+    ),
+    sort_by: Optional[str] = Query(
+        None, description=f"One of chat_id, {', '.join(ALLOWED_SORT_FIELDS)}; cursor requires chat_id"
+    ),
+    sort_dir: str = Query("asc", description="asc or desc"),
 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: service.User = Depends(get_current_user),
 ):
     """
     Fetch WhatsApp chats with optional filtering and pagination.
     """
 
-    return whatsapp_data_repository.get_cs_messages(
+    return ORJSONResponse(await whatsapp_data_repository.get_cs_messages(
         client_phone=client_phone,
         client_id=client_id,
         customer_support_id=customer_support_id,
         rating=rating,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        count_mode=count,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
         day_time_from=day_time_from,
         day_time_to=day_time_to,
         db=db,
         current_user=current_user,
-    )
+    ))
 
 
 
-@router.get("/ai", status_code=status.HTTP_200_OK, summary="Get all messages from WhatsApp AI chats")
-def get_chat_ai_messages(
+@router.get("/ai", status_code=status.HTTP_200_OK, summary="Get all messages from WhatsApp AI chats",
+            response_class=ORJSONResponse)
+async def get_chat_ai_messages(
     day_time_from: Optional[date] = Query(None),
     day_time_to: Optional[date] = Query(None),
     client_phone: Optional[str] = Query(
@@ -82,23 +97,183 @@ def get_chat_ai_messages(
     ),
     page: int = Query(1, ge=1),
     page_size: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = Query(
+        None, description="Opaque next_cursor from a previous page; takes precedence over page"
+    ),
+    count: Literal["exact", "estimate", "none"] = Query(
+        "exact", description="exact: cached COUNT, estimate: planner row estimate, none: skip total_records"
+    ),
+    sort_by: Optional[str] = Query(
+        None, description=f"One of id, {', '.join(AI_ALLOWED_SORT_FIELDS)}; cursor requires id"
+    ),
+    sort_dir: str = Query("asc", description="asc or desc"),
 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: service.User = Depends(get_current_user),
 ):
     """
     Fetch WhatsApp chats with optional filtering and pagination.
     """
 
-    return whatsapp_data_repository.get_chat_ai_messages(
+    return ORJSONResponse(await whatsapp_data_repository.get_chat_ai_messages(
         client_phone=client_phone,
         # client_id=client_id,
         # customer_support_id=customer_support_id,
         # rating=rating,
         page=page,
         page_size=page_size,
+        cursor=cursor,
+        count_mode=count,
+        sort_by=sort_by,
+        sort_dir=sort_dir,
         day_time_from=day_time_from,
         day_time_to=day_time_to,
         db=db,
         current_user=current_user,
-    )
\ No newline at end of file
+    ))
+
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def export_response(stream, name: str, fmt: str):
+    return StreamingResponse(
+        stream,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/customer_service/export", status_code=status.HTTP_200_OK, summary="Export customer service chat messages")
+async def export_cs_messages(
+    day_time_from: Optional[date] = Query(None),
+    day_time_to: Optional[date] = Query(None),
+    client_phone: Optional[str] = Query(
+        None, description="Client phone number"
+    ),
+    client_id: Optional[int] = Query(
+        None, description="Client ID"
+    ),
+    customer_support_id: Optional[int] = Query(
+        None, description="Customer support ID"
+    ),
+    rating: Optional[int] = Query(
+        None, description="Chat rating"
+    ),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+
+    current_user: service.User = Depends(get_current_user),
+):
+    """
+    Stream every matching customer service chat as NDJSON or CSV.
+    """
+    filters = {
+        "client_phone": client_phone,
+        "client_id": client_id,
+        "customer_support_id": customer_support_id,
+        "rating": rating,
+        "day_time_from": day_time_from,
+        "day_time_to": day_time_to,
+    }
+
+    stream = await whatsapp_data_repository.export_cs_messages(
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        fmt=format,
+        current_user=current_user,
+    )
+    return export_response(stream, "customer_service_chats", format)
+
+
+@router.get("/ai/export", status_code=status.HTTP_200_OK, summary="Export WhatsApp AI chat messages")
+async def export_chat_ai_messages(
+    day_time_from: Optional[date] = Query(None),
+    day_time_to: Optional[date] = Query(None),
+    client_phone: Optional[str] = Query(
+        None, description="Client phone number"
+    ),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+
+    current_user: service.User = Depends(get_current_user),
+):
+    """
+    Stream every matching AI chat as NDJSON or CSV.
+    """
+    filters = {
+        "client_phone": client_phone,
+        "day_time_from": day_time_from,
+        "day_time_to": day_time_to,
+    }
+
+    stream = await whatsapp_data_repository.export_chat_ai_messages(
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        fmt=format,
+        current_user=current_user,
+    )
+    return export_response(stream, "ai_chats", format)
+
+
+@router.get("/customer_service/aggregate", status_code=status.HTTP_200_OK, summary="Customer service chat counts per period")
+async def aggregate_cs_messages(
+    group_by: Literal["ratings", "customer_support"] = Query("ratings"),
+    period: Literal["day", "month"] = Query("day"),
+    day_time_from: Optional[date] = Query(None),
+    day_time_to: Optional[date] = Query(None),
+    customer_support_id: Optional[int] = Query(
+        None, description="Customer support ID"
+    ),
+
+    db: AsyncSession = Depends(get_async_db),
+    current_user: service.User = Depends(get_current_user),
+):
+    """
+    Count customer service chats per day or month, grouped by rating or agent.
+    """
+    filters = {
+        "customer_support_id": customer_support_id,
+        "day_time_from": day_time_from,
+        "day_time_to": day_time_to,
+    }
+
+    return await whatsapp_data_repository.aggregate_cs_messages(
+        group_by=group_by,
+        period=period,
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        db=db,
+        current_user=current_user,
+    )
+
+
+@router.get("/ai/aggregate", status_code=status.HTTP_200_OK, summary="WhatsApp AI chat counts and sentiment per period")
+async def aggregate_chat_ai_messages(
+    group_by: Literal["sentiment", "msg_classification", "product", "town"] = Query("sentiment"),
+    period: Literal["day", "month"] = Query("day"),
+    day_time_from: Optional[date] = Query(None),
+    day_time_to: Optional[date] = Query(None),
+    product: Optional[str] = Query(None),
+    town: Optional[str] = Query(None),
+
+    db: AsyncSession = Depends(get_async_db),
+    current_user: service.User = Depends(get_current_user),
+):
+    """
+    Count AI chats and average sentiment per day or month, grouped by the
+    chosen column.
+    """
+    filters = {
+        "product": product,
+        "town": town,
+        "day_time_from": day_time_from,
+        "day_time_to": day_time_to,
+    }
+
+    return await whatsapp_data_repository.aggregate_chat_ai_messages(
+        group_by=group_by,
+        period=period,
+        active_filters={k: v for k, v in filters.items() if v is not None},
+        db=db,
+        current_user=current_user,
+    )
+
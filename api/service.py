@@ -75,6 +75,9 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Union[str, None] = None
     scopes: List[str] = []
+    id_company: Optional[int] = None
+    version: Optional[int] = None
+    superuser: bool = False
 
 
 class SystemFunctions(BaseModel):
@@ -1,29 +1,107 @@
 from api import database, models
+from api.libs.cache import TTLCache
 from fastapi import Depends, HTTPException
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
+from dotenv import dotenv_values
+import datetime
 
-def if_authorized(current_user, db: Session = Depends(database.get_db)):
+config = dotenv_values(".env")
+
+# Resolved privileges per (username, id_company). Entries expire after
+# PRIV_CACHE_TTL seconds and are dropped explicitly whenever group/role
+# membership changes.
+PRIV_CACHE_TTL = int(config.get("PRIV_CACHE_TTL") or 300)
+PRIV_CACHE_SIZE = int(config.get("PRIV_CACHE_SIZE") or 1024)
+
+# Per-company privilege version stamped into access tokens. Tokens carrying
+# an older version are rejected; the lookup is cached for PRIV_VERSION_TTL
+# seconds so scope checks normally never reach the database.
+PRIV_VERSION_TTL = int(config.get("PRIV_VERSION_TTL") or 30)
+
+privilege_cache = TTLCache(maxsize=PRIV_CACHE_SIZE, ttl=PRIV_CACHE_TTL)
+version_cache = TTLCache(maxsize=PRIV_CACHE_SIZE, ttl=PRIV_VERSION_TTL)
+
+
+def privilege_version(db: Session, id_company, use_cache=True):
+    version = version_cache.get(id_company) if use_cache else None
+    if version is not None:
+        return version
+    row = db.query(models.PrivilegeVersion).filter(
+        models.PrivilegeVersion.id_company == id_company).first()
+    version = row.version if row else 0
+    version_cache.set(id_company, version)
+    return version
+
+
+def bump_privilege_version(db: Session, id_company):
+    # One upsert, so concurrent bumps each get their own version.
+    table = models.PrivilegeVersion.__table__
+    now = datetime.datetime.now()
+    stmt = pg_insert(table).values(id_company=id_company, version=1, updated_at=now)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id_company],
+        set_={"version": table.c.version + 1, "updated_at": now},
+    ).returning(table.c.version)
+    version = db.execute(stmt).scalar_one()
+    db.commit()
+    version_cache.set(id_company, version)
+    return version
+
+
+def invalidate_privileges(db: Session, id_company, username=None):
+    """
+    Forget cached privileges for one user or for a whole company and bump
+    the company privilege version so previously issued tokens go stale.
+    """
+    if username is not None:
+        privilege_cache.pop((username, id_company))
+    else:
+        privilege_cache.discard_where(lambda key: key[1] == id_company)
+    bump_privilege_version(db, id_company)
+
+
+class TokenUser():
+    """The caller as described by a verified access token, no user row."""
+
+    def __init__(self, token_data):
+        self.username = token_data.username
+        self.id_company = token_data.id_company
+        self.scopes = frozenset(token_data.scopes)
+        self.is_superuser = token_data.superuser
+
+
+def get_active_user(current_user, db: Session):
     is_active= db.query(models.User).filter(
         models.User.user_username  == current_user).filter(models.User.user_status == True).first()
     if not is_active:
         raise HTTPException(status_code=401,
                             detail='Not authorized')
-    check_user_grp = db.query(models.GroupUser).filter(
+    return is_active
+
+
+def load_privileges(is_active, db: Session):
+    rows = db.query(models.RolesPriviledges.id_func).join(
+                                models.GroupRoles,
+                                (models.GroupRoles.id_role == models.RolesPriviledges.id_role)
+                                & (models.GroupRoles.id_company == models.RolesPriviledges.id_company)).join(
+                                models.GroupUser,
+                                (models.GroupUser.id_group == models.GroupRoles.id_group)
+                                & (models.GroupUser.id_company == models.GroupRoles.id_company)).filter(
                                 models.GroupUser.id_user == is_active.id).filter(
-                                models.GroupUser.id_company == is_active.id_company).all()
-    usergrp = [row.id_group for row in check_user_grp]
-    all_roles_grp = []
-    for rlegrp in usergrp:
-        all_roles = db.query(models.GroupRoles).filter(
-                                models.GroupRoles.id_group == rlegrp).filter(
-                                models.GroupRoles.id_company == is_active.id_company).all()
-        for listroles in all_roles:
-            all_roles_grp.append(listroles.id_role)
-    all_system_func = []
-    for system_func in all_roles_grp:
-        all_sys_func = db.query(models.RolesPriviledges).filter(
-                                models.RolesPriviledges.id_role == system_func).filter(
-                                models.RolesPriviledges.id_company == is_active.id_company).all()
-        for sys_func in all_sys_func:
-            all_system_func.append(sys_func.id_func)
-    return all_system_func 
\ No newline at end of file
+                                models.GroupUser.id_company == is_active.id_company).distinct().all()
+    return frozenset(row.id_func for row in rows)
+
+
+def resolve_privileges(is_active, db: Session):
+    cache_key = (is_active.user_username, is_active.id_company)
+    cached = privilege_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    all_system_func = load_privileges(is_active, db)
+    privilege_cache.set(cache_key, all_system_func)
+    return all_system_func
+
+
+def if_authorized(current_user, db: Session = Depends(database.get_db)):
+    return resolve_privileges(get_active_user(current_user, db), db)
@@ -3,6 +3,8 @@ from api.database import SessionLocal
 import datetime
 import json
 from api.libs.hashing import Hash
+from api.utils.check_if_authorized import invalidate_privileges
+from api.utils.system_functions_registry import refresh_registry
 from sqlalchemy.exc import SQLAlchemyError
 
 
@@ -51,6 +53,7 @@ def create_system_functions():
             )
             db.add(create_sys_func)
             db.commit()
+    refresh_registry(db)
     db.close()
 
 
@@ -106,6 +109,9 @@ def create_admin_priviledges(id_company, id_user):
         )
         db.add(create_grp_usr)
         db.commit()
-        db.close()
+        invalidate_privileges(db, id_company)
     except SQLAlchemyError as e:
         print(e)
+    finally:
+        # invalidate_privileges() reopens the session for the version bump.
+        db.close()
@@ -0,0 +1,69 @@
+from api import models
+from sqlalchemy.orm import Session
+from types import MappingProxyType
+import threading
+
+"""
+
+    In-process registry of system function names and ids.
+
+    Built once at startup by create_system_functions() and swapped for a new
+    read-only mapping whenever it is refreshed, so login turns privilege ids
+    into token scopes, and "Can_X" into an id, with a dict lookup instead of
+    a query.
+
+    A name or id missing from the registry reloads it once; if it is still
+    missing it is remembered as such until the next refresh_registry(), so a
+    misspelt privilege name does not cost a query per request.
+
+"""
+
+_lock = threading.Lock()
+_ids_by_name = MappingProxyType({})
+_names_by_id = MappingProxyType({})
+_missing = frozenset()
+
+
+def _load(db: Session):
+    global _ids_by_name, _names_by_id
+    rows = db.query(models.SystemFunction.id, models.SystemFunction.func_name).all()
+    ids_by_name = {row.func_name: row.id for row in rows}
+    with _lock:
+        _ids_by_name = MappingProxyType(ids_by_name)
+        _names_by_id = MappingProxyType({v: k for k, v in ids_by_name.items()})
+
+
+def _remember_missing(keys):
+    global _missing
+    with _lock:
+        _missing = _missing | frozenset(keys)
+
+
+def refresh_registry(db: Session):
+    global _missing
+    _load(db)
+    with _lock:
+        _missing = frozenset()
+
+
+def func_id(func_name: str, db: Session = None):
+    """
+    Return the id of a system function, or None if it does not exist.
+    An unknown name triggers one reload from the database when db is given.
+    """
+    priv_id = _ids_by_name.get(func_name)
+    if priv_id is None and db is not None and func_name not in _missing:
+        _load(db)
+        priv_id = _ids_by_name.get(func_name)
+        if priv_id is None:
+            _remember_missing([func_name])
+    return priv_id
+
+
+def func_names(func_ids, db: Session = None):
+    unknown = [i for i in func_ids if i not in _names_by_id and i not in _missing]
+    if db is not None and unknown:
+        _load(db)
+        _remember_missing(i for i in unknown if i not in _names_by_id)
+    names = _names_by_id
+    return sorted(names[i] for i in func_ids if i in names)
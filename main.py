@@ -1,7 +1,12 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api import models
 from api.database import engine
+from api.libs.hashing import hasher
+from api.libs.bc_client import bc_client
+from api.libs import bc_sync
 
 # Access Control
 from api.utils.default_sett import default_admin, create_system_functions
@@ -19,8 +24,9 @@ from api.routers.v1.marketing_promotion import (
     marketing_promotion_router as marketing_promotion_router,
 )
 from api.routers.v1.receipt_ocr import ocr_router
-from api.routers.v1.whatsapp_data import whatsapp_data_router
+from api.routers.v1.whatsapp_data import whatsapp_data_router, whatsapp_data_rollup
 from api.routers.v1.brand import brand_router
+from api.routers.v1.metrics import metrics_router
 
 app = FastAPI()
 
@@ -55,6 +61,31 @@ app.include_router(marketing_promotion_router.router)
 app.include_router(ocr_router.router)
 app.include_router(whatsapp_data_router.router)
 app.include_router(brand_router.router)
+app.include_router(metrics_router.router)
+
+
+@app.on_event("startup")
+async def start_background_refresh():
+    # Opt-in: keep the WhatsApp rollup tables fresh from inside the API.
+    app.state.background_tasks = []
+    if whatsapp_data_rollup.WA_ROLLUP_REFRESH_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(
+            whatsapp_data_rollup.refresh_forever(whatsapp_data_rollup.WA_ROLLUP_REFRESH_SECONDS)
+        ))
+    # Opt-in: keep the Business Central mirror tables in sync.
+    if bc_sync.BC_SYNC_SECONDS > 0:
+        app.state.background_tasks.append(asyncio.create_task(
+            bc_sync.sync_forever(bc_sync.BC_SYNC_SECONDS)
+        ))
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    for task in getattr(app.state, "background_tasks", []):
+        task.cancel()
+    hasher.shutdown()
+    bc_client.shutdown()
+
 
 # if __name__ == "__main__":
 #     uvicorn.run(app, host="127.0.0.1", port=5000)
@@ -0,0 +1,75 @@
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from api.routers.v1.line_clearance.line_clearance_model import COLUMN_MAPPING, generate_json_output
+
+"""
+
+    Before/after timing of building the line clearance JSON output.
+
+    before: DataFrame.iterrows(), one boxed Series per row, which is what
+            generate_json_output did
+    after:  the shared column-wise builder in api.libs.json_output
+
+    Run from the repository root:  python -m tests.bench_json_output [rows ...]
+
+"""
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def make_frame(rows):
+    """A processed line clearance frame, dtypes as the OData client builds them."""
+    i = np.arange(rows)
+    return pd.DataFrame({
+        "Production_Order_No": "PO" + pd.Series(i % 5000).astype(str),
+        "Entry_No": i,
+        "Manufacturing_Date": pd.Timestamp("2024-01-02") + pd.to_timedelta(i % 365, unit="D"),
+        "Bulk_Batch_No": "B" + pd.Series(i).astype(str),
+        "Finished_Batch_No": "F" + pd.Series(i).astype(str),
+        "Expiration_Date": pd.Timestamp("2025-01-02") + pd.to_timedelta(i % 365, unit="D"),
+        "Type": "Local",
+        "Item_Description": "Item " + pd.Series(i % 800).astype(str),
+        "Planned_Quantity": (i % 97) * 1.5,
+    })
+
+
+def before(df):
+    json_output = []
+    output_columns = [
+        'Item_Description', 'Production_Order_No', 'Manufacturing_Date',
+        'Bulk_Batch_No', 'Expiration_Date', 'Planned_Quantity'
+    ]
+    for _, row in df[output_columns].iterrows():
+        json_output.append({
+            "item_description": {
+                COLUMN_MAPPING["Item_Description"]: str(row['Item_Description'])
+            },
+            "data": {
+                COLUMN_MAPPING["Production_Order_No"]: str(row['Production_Order_No']),
+                COLUMN_MAPPING["Manufacturing_Date"]: str(row['Manufacturing_Date']),
+                COLUMN_MAPPING["Bulk_Batch_No"]: str(row['Bulk_Batch_No']),
+                COLUMN_MAPPING["Expiration_Date"]: str(row['Expiration_Date']),
+                COLUMN_MAPPING["Planned_Quantity"]: float(row['Planned_Quantity'])
+            }
+        })
+    return json_output
+
+
+def after(df):
+    return generate_json_output(df)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    for rows in sizes:
+        df = make_frame(rows)
+        assert before(df.head(1000)) == after(df.head(1000))
+        timings = {}
+        for name, func in (("before", before), ("after", after)):
+            timings[name] = min(timeit.repeat(lambda: func(df), number=1, repeat=3 if rows < 1_000_000 else 1))
+        print(f"{rows:>9} rows  before {timings['before']:8.3f}s  after {timings['after']:7.3f}s  "
+              f"{timings['before'] / timings['after']:5.1f}x")
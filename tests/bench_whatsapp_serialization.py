@@ -0,0 +1,76 @@
+import datetime
+import timeit
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, text
+
+from api.libs.responses import ORJSONResponse
+from api.routers.v1.whatsapp_data.whatsapp_data_model import WhatsAppChat
+from api.routers.v1.whatsapp_data.whatsapp_data_query import CS_QUERY
+
+"""
+
+    Before/after timing of serializing one 100 row customer service page.
+
+    before: WhatsAppChat(**row) per row, then FastAPI's jsonable_encoder and
+            JSONResponse, which is what a dict return without response_model did
+    after:  dict(row) per row rendered by ORJSONResponse
+
+    Run from the repository root:  python -m tests.bench_whatsapp_serialization
+
+"""
+
+PAGE_SIZE = 100
+ROUNDS = 500
+
+
+def load_rows():
+    """RowMapping rows, the same objects the repository gets from the driver."""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE chats (chat_id int, customer_support_id int, customer_support text, "
+            "client_id int, client_name text, client_phone text, chat_originator text, "
+            "chat_message text, timestamp timestamp, day_time date, first_day_of_month date, ratings text)"
+        ))
+        start = datetime.datetime(2024, 1, 1, 8, 0)
+        for i in range(PAGE_SIZE):
+            ts = start + datetime.timedelta(minutes=17 * i)
+            conn.execute(text(
+                "INSERT INTO chats VALUES (:i, :cs, 'Agent Name', :cl, 'Client Name', '0712345678', "
+                "'client', :msg, :ts, :d, :m, '5')"
+            ), dict(i=i, cs=i % 4, cl=i % 30, msg="Habari, nataka kujua bei ya bidhaa " * 3,
+                    ts=ts, d=ts.date(), m=ts.date().replace(day=1)))
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT {CS_QUERY.select_list} FROM chats")).mappings().all()
+
+    # sqlite hands back strings for dates, Postgres hands back date objects.
+    return [
+        {**row,
+         "timestamp": datetime.datetime.fromisoformat(row["timestamp"]),
+         "day_time": datetime.date.fromisoformat(row["day_time"]),
+         "first_day_of_month": datetime.date.fromisoformat(row["first_day_of_month"])}
+        for row in rows
+    ]
+
+
+def page(data):
+    return {"data": data, "page": 1, "page_size": PAGE_SIZE, "total_records": 10000,
+            "next_cursor": None, "applied_filters": {}}
+
+
+def before(rows):
+    return JSONResponse(jsonable_encoder(page([WhatsAppChat(**row) for row in rows]))).body
+
+
+def after(rows):
+    return ORJSONResponse(page([dict(row) for row in rows])).body
+
+
+if __name__ == "__main__":
+    rows = load_rows()
+    for name, func in (("before", before), ("after", after)):
+        seconds = min(timeit.repeat(lambda: func(rows), number=ROUNDS, repeat=3))
+        print(f"{name:>6}: {seconds / ROUNDS * 1000:.3f} ms per {PAGE_SIZE} row page")
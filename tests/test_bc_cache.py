@@ -0,0 +1,169 @@
+"""
+
+    Stale-while-revalidate cache in front of the BC integrations.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import threading
+import time
+
+import pytest
+
+from api.libs.bc_cache import MemoryCacheStore, StaleWhileRevalidateCache, UncachedResult
+
+
+def make_cache(ttl=60, stale_ttl=600):
+    return StaleWhileRevalidateCache(MemoryCacheStore(), ttl=ttl, stale_ttl=stale_ttl)
+
+
+def age(cache, key, seconds):
+    value, fetched_at = cache.store.get(key)
+    cache.store.set(key, value, fetched_at - seconds, 0)
+
+
+def wait_for_refreshes(cache, key, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with cache._lock:
+            if key not in cache._inflight:
+                return
+        time.sleep(0.01)
+    raise AssertionError(f"refresh of {key} still running")
+
+
+def test_fresh_value_is_served_without_loading():
+    cache = make_cache()
+    assert cache.get_or_load("k", lambda: [1]) == [1]
+    assert cache.get_or_load("k", lambda: [2]) == [1]
+    assert cache.metrics()["fresh"] == 1
+
+
+def test_stale_value_is_served_and_refreshed_in_background():
+    cache = make_cache()
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 120)
+    assert cache.get_or_load("k", lambda: [2]) == [1]
+    wait_for_refreshes(cache, "k")
+    assert cache.get_or_load("k", lambda: [3]) == [2]
+    assert cache.metrics()["refreshes"] == 1
+
+
+def test_expired_value_is_loaded_on_the_request_path():
+    cache = make_cache(ttl=60, stale_ttl=60)
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 500)
+    assert cache.get_or_load("k", lambda: [2]) == [2]
+
+
+def test_concurrent_stale_hits_start_one_refresh():
+    cache = make_cache()
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 120)
+
+    calls = []
+    release = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return [2]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", slow_loader)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+    wait_for_refreshes(cache, "k")
+
+    assert results == [[1]] * 8
+    assert len(calls) == 1
+
+
+def test_concurrent_misses_share_one_load():
+    cache = make_cache()
+    calls = []
+    release = threading.Event()
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return [1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("k", slow_loader)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [[1]] * 5
+    assert len(calls) == 1
+    assert cache.metrics()["coalesced"] == 4
+
+
+def test_failed_refresh_keeps_the_cached_value():
+    cache = make_cache()
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 120)
+
+    def failing_loader():
+        raise RuntimeError("bc down")
+
+    assert cache.get_or_load("k", failing_loader) == [1]
+    wait_for_refreshes(cache, "k")
+    assert cache.store.get("k")[0] == [1]
+    assert cache.metrics()["refresh_errors"] == 1
+
+
+def test_uncached_refresh_keeps_the_cached_value():
+    cache = make_cache()
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 120)
+
+    def partial_loader():
+        raise UncachedResult([], "source missing")
+
+    assert cache.get_or_load("k", partial_loader) == [1]
+    wait_for_refreshes(cache, "k")
+    assert cache.store.get("k")[0] == [1]
+    assert cache.metrics()["refresh_errors"] == 1
+
+
+def test_uncached_miss_is_served_but_not_stored():
+    cache = make_cache()
+
+    def partial_loader():
+        raise UncachedResult(["partial"], "source missing")
+
+    assert cache.get_or_load("k", partial_loader) == ["partial"]
+    assert cache.store.get("k") is None
+    assert cache.get_or_load("k", lambda: ["full"]) == ["full"]
+    assert cache.metrics()["uncached"] == 1
+
+
+def test_failed_miss_raises():
+    cache = make_cache()
+
+    def failing_loader():
+        raise RuntimeError("bc down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing_loader)
+    assert cache.store.get("k") is None
+
+
+def test_ttl_override():
+    cache = make_cache(ttl=60)
+    cache.set_ttl("k", 1)
+    cache.get_or_load("k", lambda: [1])
+    age(cache, "k", 5)
+    assert cache.get_or_load("k", lambda: [2]) == [1]
+    assert cache.metrics()["stale"] == 1
+    wait_for_refreshes(cache, "k")
@@ -0,0 +1,42 @@
+"""
+
+    Checkout wait telemetry of the sync engine's connection pool.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import exc
+
+from api.database import TimedQueuePool
+
+
+def slow_connect():
+    time.sleep(0.2)
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+def test_connect_time_is_not_counted_as_wait():
+    pool = TimedQueuePool(slow_connect, pool_size=1, max_overflow=0)
+    pool.connect().close()
+    stats = pool.wait_stats
+    assert (stats["checkouts"], stats["connects"]) == (1, 1)
+    assert stats["max_connect"] >= 0.2
+    assert stats["max_wait"] < 0.1
+
+
+def test_queue_wait_and_timeouts_are_recorded():
+    pool = TimedQueuePool(slow_connect, pool_size=1, max_overflow=0, timeout=0.3)
+    held = pool.connect()
+    threading.Timer(0.15, held.close).start()
+    held = pool.connect()  # keep the only connection checked out
+    assert 0.1 < pool.wait_stats["max_wait"] < 0.3
+
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+    assert pool.wait_stats["timeouts"] == 1
+    assert pool.wait_stats["connects"] == 1
@@ -0,0 +1,68 @@
+"""
+
+    Process-pool bcrypt service used by login and the user routes.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from passlib.hash import bcrypt as bcrypt_hash
+
+from api.libs import hashing
+from api.libs.hashing import HashingBusy, HashingService
+from api.routers.v1.user import user_router
+
+
+@pytest.fixture
+def service():
+    service = HashingService(max_workers=1, max_pending=2)
+    yield service
+    service.shutdown()
+
+
+def test_hash_verifies(service):
+    hashed = asyncio.run(service.bcrypt("secret"))
+    assert asyncio.run(service.verify_and_update(hashed, "secret")) == (True, None)
+    assert asyncio.run(service.verify_and_update(hashed, "wrong")) == (False, None)
+
+
+def test_pending_jobs_are_bounded(service):
+    async def burst():
+        return await asyncio.gather(*[service.bcrypt("secret") for _ in range(3)],
+                                    return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert [type(result) for result in results[:2]] == [str, str]
+    assert isinstance(results[2], HashingBusy)
+    metrics = service.metrics()
+    assert (metrics["completed"], metrics["rejected"], metrics["queue_depth"]) == (2, 1, 0)
+
+
+def test_outdated_cost_is_rehashed(service):
+    old = bcrypt_hash.using(rounds=4).hash("secret")
+    verified, new_hash = asyncio.run(service.verify_and_update(old, "secret"))
+    assert verified
+    assert bcrypt_hash.from_string(new_hash).rounds == hashing.BCRYPT_ROUNDS
+    assert hashing.Hash.verify(new_hash, "secret")
+
+
+def test_failed_jobs_are_counted_apart(service):
+    with pytest.raises(ValueError):
+        asyncio.run(service.verify_and_update("not a bcrypt hash", "secret"))
+    asyncio.run(service.bcrypt("secret"))
+    metrics = service.metrics()
+    assert (metrics["failed"], metrics["completed"]) == (1, 1)
+    assert metrics["avg_latency_ms"] > 0
+
+
+def test_busy_service_maps_to_503(monkeypatch):
+    busy = HashingService(max_workers=1, max_pending=0)
+    monkeypatch.setattr(user_router, "hasher", busy)
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(user_router.hash_password("secret"))
+    assert refused.value.status_code == 503
+    assert refused.value.headers == {"Retry-After": "1"}
+    assert busy.metrics()["rejected"] == 1
@@ -0,0 +1,196 @@
+"""
+
+    Declarative BC pipelines: latest_per_key and the engine around specs.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.libs import pipeline
+from api.libs.bc_cache import UncachedResult
+from api.libs.pipeline import Pipeline, latest_per_key
+
+
+SPEC = {
+    "name": "orders",
+    "params": {"since": {"value": "2024-01-01"}},
+    "sources": {
+        "orders": {
+            "endpoint": "Orders",
+            "filters": [
+                {"column": "Order_No", "op": "ne", "value": "X"},
+                {"column": "Posted", "op": "gt", "value": {"param": "since"}},
+            ],
+            "rename": {"No": "Order_No"},
+            "dedupe": ["Order_No"],
+            "order_by": [["Order_No", "asc"], ["Modified", "desc"]],
+            "columns": ["Order_No", "Customer"],
+        },
+        "lines": {
+            "endpoint": "Lines",
+            "filters": [{"column": "Type", "op": "in", "value": ["Item", "Resource"]}],
+            "columns": ["Order_No", "Quantity"],
+        },
+        "notes": {
+            "endpoint": "Notes",
+            "columns": ["Order_No", "Note"],
+        },
+    },
+    "base": "lines",
+    "joins": [
+        {"source": "orders", "on": "Order_No", "how": "inner"},
+        {"source": "notes", "on": "Order_No", "how": "left"},
+    ],
+    "output": {
+        "description": ["Customer"],
+        "mapping": {"Customer": "3", "Order_No": "14", "Quantity": "7", "Note": "8"},
+        "casts": {"Quantity": "float"},
+    },
+}
+
+
+def frames():
+    return {
+        "orders": pd.DataFrame({"No": ["A", "A", "B"], "Customer": ["Other", "Acme", "Bolt"],
+                                "Modified": ["2024-02-01", "2024-03-01", "2024-01-01"],
+                                "Unused": [1, 2, 3]}),
+        "lines": pd.DataFrame({"Order_No": ["A", "B", "C"], "Quantity": [1, 2, 3],
+                               "Type": ["Item", "Item", "Item"]}),
+        "notes": pd.DataFrame({"Order_No": ["A"], "Note": ["urgent"]}),
+    }
+
+
+@pytest.fixture
+def bc(monkeypatch):
+    """BC fetches answered from `bc.frames`, with the mirror turned off."""
+    class FakeBC():
+        frames = frames()
+        calls = []
+
+        def fetch_dataframes(self, fetches, deadline=None):
+            self.calls.append(fetches)
+            return {name: self.frames.get(name) for name in fetches}
+
+    fake = FakeBC()
+    monkeypatch.setattr(pipeline, "bc_client", fake)
+    monkeypatch.setattr(pipeline, "mirror_dataframes", lambda queries, date_columns: None)
+    return fake
+
+
+def test_latest_per_key_keeps_highest_per_key():
+    df = pd.DataFrame({"serialNo": ["A", "B", "A", "B", "C"],
+                       "Entry_No": [1, 5, 3, 2, np.nan],
+                       "value": [10, 50, 30, 20, 99]})
+    latest = latest_per_key(df, ["serialNo"], "Entry_No")
+    assert latest["serialNo"].tolist() == ["B", "A"]
+    assert latest["value"].tolist() == [50, 30]
+
+
+def test_latest_per_key_matches_sort_and_drop_duplicates():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"Entry_No": rng.permutation(5000),
+                       "serialNo": rng.integers(0, 100, 5000).astype(str)})
+    df.index = rng.integers(0, 10, 5000)  # duplicate labels
+    expected = df.sort_values("Entry_No", ascending=False).drop_duplicates("serialNo")
+    latest = latest_per_key(df, ["serialNo"], "Entry_No")
+    assert latest["Entry_No"].tolist() == expected["Entry_No"].tolist()
+
+
+def test_queries_use_bc_names_and_only_needed_columns():
+    p = Pipeline(SPEC)
+    orders = p.sources["orders"]
+    query = orders.odata_query(p.resolved_params())
+    assert query.select == ("No", "Customer", "Modified")
+    assert query.filter == "No ne 'X' and Posted gt '2024-01-01'"
+    assert query.orderby == "No asc,Modified desc"
+
+    mirror = orders.mirror_query(p.resolved_params())
+    assert mirror.where == '"No" <> :orders_0 AND "Posted" > :orders_1'
+    assert mirror.order_by == '"No" ASC, "Modified" DESC'
+    assert mirror.params == {"orders_0": "X", "orders_1": "2024-01-01"}
+
+    lines = p.sources["lines"].odata_query({})
+    assert lines.filter == "(Type eq 'Item' or Type eq 'Resource')"
+
+
+def with_orders(**changes):
+    return {**SPEC, "sources": {**SPEC["sources"], "orders": {**SPEC["sources"]["orders"], **changes}}}
+
+
+@pytest.mark.parametrize("order_by", [[], [["Order_No", "asc"]]])
+def test_dedupe_without_a_tiebreaker_is_rejected(order_by):
+    with pytest.raises(ValueError):
+        Pipeline(with_orders(order_by=order_by))
+
+
+def test_unknown_join_source_is_rejected():
+    with pytest.raises(ValueError):
+        Pipeline({**SPEC, "joins": [{"source": "nope", "on": "Order_No"}]})
+
+
+def test_run_dedupes_joins_and_projects(bc):
+    output = Pipeline(SPEC).run()
+    assert output == [
+        {"item_description": {"3": "Acme"}, "data": {"14": "A", "7": 1.0, "8": "urgent"}},
+        {"item_description": {"3": "Bolt"}, "data": {"14": "B", "7": 2.0, "8": "nan"}},
+    ]
+
+
+def test_dedupe_keeps_the_first_row_in_spec_order_whatever_the_source_order(bc):
+    # Acme is the newest "A" but comes second from the source.
+    assert Pipeline(SPEC).run()[0]["item_description"] == {"3": "Acme"}
+
+    bc.frames["orders"] = bc.frames["orders"].iloc[::-1]
+    assert Pipeline(SPEC).run()[0]["item_description"] == {"3": "Acme"}
+
+    bc.frames["orders"] = bc.frames["orders"].assign(Modified="2024-01-01")
+    spec = with_orders(order_by=[["Order_No", "asc"], ["Modified", "desc"], ["Customer", "asc"]])
+    assert Pipeline(spec).run()[0]["item_description"] == {"3": "Acme"}
+
+
+def test_failed_left_join_source_is_served_but_not_cacheable(bc):
+    bc.frames["notes"] = None
+    with pytest.raises(UncachedResult) as failed:
+        Pipeline(SPEC).run()
+    assert [row["data"]["8"] for row in failed.value.value] == ["nan", "nan"]
+
+
+def test_failed_base_source_is_not_cacheable(bc):
+    bc.frames["lines"] = None
+    with pytest.raises(UncachedResult) as failed:
+        Pipeline(SPEC).run()
+    assert failed.value.value == []
+
+
+def test_incremental_latest_only_fetches_newer_rows(bc):
+    spec = {
+        "name": "vehicles",
+        "sources": {
+            "maintenance": {
+                "endpoint": "Maintenance",
+                "latest": {"key": ["serialNo"], "by": "Entry_No", "incremental": True},
+                "columns": ["serialNo", "value"],
+            },
+        },
+        "base": "maintenance",
+        "output": {"description": ["serialNo"], "mapping": {"serialNo": "507", "value": "509"}},
+    }
+    p = Pipeline(spec)
+    bc.frames = {"maintenance": pd.DataFrame({"Entry_No": [1, 2, 3], "serialNo": ["A", "B", "A"],
+                                              "value": [10, 20, 30]})}
+    assert p.run() == [{"item_description": {"507": "A"}, "data": {"509": "30"}},
+                       {"item_description": {"507": "B"}, "data": {"509": "20"}}]
+
+    bc.frames = {"maintenance": pd.DataFrame({"Entry_No": [4], "serialNo": ["B"], "value": [40]})}
+    assert p.run() == [{"item_description": {"507": "B"}, "data": {"509": "40"}},
+                       {"item_description": {"507": "A"}, "data": {"509": "30"}}]
+    assert bc.calls[-1]["maintenance"]["query"].filter == "Entry_No gt 3"
+
+    # A failed incremental fetch serves the rows already kept, uncached.
+    bc.frames = {"maintenance": None}
+    with pytest.raises(UncachedResult) as failed:
+        p.run()
+    assert len(failed.value.value) == 2
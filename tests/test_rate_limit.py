@@ -0,0 +1,72 @@
+"""
+
+    Sliding window login throttle, in-memory store.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import pytest
+
+from api.libs import rate_limit
+from api.libs.rate_limit import MemoryWindowStore, SlidingWindowLimiter
+
+
+class Clock():
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+def test_allows_until_limit(clock):
+    limiter = SlidingWindowLimiter(MemoryWindowStore(), limit=3, window=60)
+    for _ in range(2):
+        limiter.record("user:a")
+        assert limiter.retry_after("user:a") == 0
+    limiter.record("user:a")
+    assert limiter.retry_after("user:a") == 61
+
+
+def test_retry_after_counts_down_from_oldest_event(clock):
+    limiter = SlidingWindowLimiter(MemoryWindowStore(), limit=2, window=60)
+    limiter.record("ip:1")
+    clock.now += 20
+    limiter.record("ip:1")
+    clock.now += 10
+    assert limiter.retry_after("ip:1") == 31
+
+
+def test_events_leave_the_window(clock):
+    limiter = SlidingWindowLimiter(MemoryWindowStore(), limit=2, window=60)
+    limiter.record("user:a")
+    limiter.record("user:a")
+    clock.now += 61
+    assert limiter.retry_after("user:a") == 0
+
+
+def test_keys_are_independent_and_reset(clock):
+    limiter = SlidingWindowLimiter(MemoryWindowStore(), limit=1, window=60)
+    limiter.record("user:a")
+    assert limiter.retry_after("user:a") > 0
+    assert limiter.retry_after("user:b") == 0
+    limiter.reset("user:a")
+    assert limiter.retry_after("user:a") == 0
+
+
+def test_store_stays_bounded(clock):
+    store = MemoryWindowStore(max_keys=3)
+    for i in range(10):
+        store.add(f"ip:{i}", 60)
+        clock.now += 1
+    assert len(store._events) <= 3
+    # The most recent key survives the sweep.
+    assert store.count("ip:9", 60)[0] == 1
@@ -0,0 +1,30 @@
+"""
+
+    orjson responses used by the WhatsApp listings.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import orjson
+import pytest
+
+from api.libs.responses import ORJSONResponse
+
+
+def test_rows_with_numeric_columns_render():
+    body = ORJSONResponse({"data": [{"chat_id": Decimal("12"), "score": Decimal("0.25"),
+                                     "day_time": date(2024, 1, 2),
+                                     "timestamp": datetime(2024, 1, 2, 3, 4, 5),
+                                     "count": np.int64(3), 7: None}]}).body
+    assert orjson.loads(body) == {"data": [{"chat_id": 12, "score": 0.25, "day_time": "2024-01-02",
+                                            "timestamp": "2024-01-02T03:04:05", "count": 3,
+                                            "7": None}]}
+
+
+def test_unsupported_types_still_fail():
+    with pytest.raises(TypeError):
+        ORJSONResponse({"value": object()})
@@ -0,0 +1,79 @@
+"""
+
+    In-process system function registry that turns privilege ids into token scopes.
+
+    Run from the repository root:  python -m pytest tests
+
+"""
+import pytest
+
+from api.utils import system_functions_registry as registry
+
+
+class Row():
+
+    def __init__(self, id, func_name):
+        self.id = id
+        self.func_name = func_name
+
+
+class FakeSession():
+    """Just enough of a Session for registry loads; counts the queries."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def query(self, *columns):
+        return self
+
+    def all(self):
+        self.queries += 1
+        return list(self.rows)
+
+
+@pytest.fixture
+def db():
+    db = FakeSession([Row(1, "Can_View_Users"), Row(2, "Can_Create_User")])
+    registry.refresh_registry(db)
+    db.queries = 0
+    return db
+
+
+def test_known_name_needs_no_query(db):
+    assert registry.func_id("Can_View_Users", db) == 1
+    assert db.queries == 0
+
+
+def test_unknown_name_reloads_once(db):
+    assert registry.func_id("Can_Typo", db) is None
+    assert registry.func_id("Can_Typo", db) is None
+    assert registry.func_id("Can_Typo", db) is None
+    assert db.queries == 1
+
+
+def test_new_function_is_found_by_the_reload(db):
+    db.rows.append(Row(3, "Can_Delete_User"))
+    assert registry.func_id("Can_Delete_User", db) == 3
+    assert db.queries == 1
+
+
+def test_refresh_forgets_misses(db):
+    assert registry.func_id("Can_Later", db) is None
+    db.rows.append(Row(4, "Can_Later"))
+    assert registry.func_id("Can_Later", db) is None
+    registry.refresh_registry(db)
+    assert registry.func_id("Can_Later", db) == 4
+
+
+def test_func_names(db):
+    assert registry.func_names([2, 1], db) == ["Can_Create_User", "Can_View_Users"]
+    assert db.queries == 0
+    assert registry.func_names([1, 99], db) == ["Can_View_Users"]
+    assert registry.func_names([1, 99], db) == ["Can_View_Users"]
+    assert db.queries == 1
+
+
+def test_without_db_nothing_is_loaded(db):
+    assert registry.func_id("Can_Typo") is None
+    assert db.queries == 0